@@ -0,0 +1,94 @@
+"""Stepping engine that only re-evaluates cells near last generation's changes.
+
+A cell whose 3x3 neighborhood did not change keeps its state: its rule table
+inputs are the same as last generation, and last generation's result is its
+current state. Only cells next to a change (from the simulation or from user
+edits) are evaluated, so settled battlefields cost almost nothing to step.
+"""
+from counter_rng import spawn_faction
+from lookup_engine import LookupEngine, NEIGHBOR_WEIGHTS, CELL_STRIDE
+from rules import SPAWN_RANDOM
+
+
+class ActiveEngine(LookupEngine):
+    """Lookup engine that tracks the active region between generations."""
+
+    def __init__(self, world, rule_table=None):
+        self.active = set()
+        # Cells changed since world.life was last written
+        self.changed = set()
+        # (cell, new state) of the generation being computed, reused by every advance()
+        self.updates = []
+        super().__init__(world, rule_table)
+        self.void_cells = set(self.void)
+
+        # Nothing is known to be stable yet, so the first step is a full sweep
+        self.active = {self.index(row, col) for row in range(self.height)
+                       for col in range(self.width)}
+
+    def mark(self, p):
+        """Mark the 3x3 neighborhood of a changed cell for re-evaluation."""
+        self.active.add(p)
+        self.active.update(p + offset for offset in self.offsets)
+
+    def sync(self):
+        """Pick up edits made directly to world.life, marking only the changed cells."""
+        life = self.life
+        world_life = self.world.life
+        for row in range(self.height):
+            p = self.index(row, 0)
+            for cell in world_life[row * self.width:(row + 1) * self.width]:
+                if life[p] != cell:
+                    life[p] = cell
+                    self.mark(p)
+                p += 1
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell, e.g. after a mouse click."""
+        super().cell_changed(row, col)
+        self.mark(self.index(row, col))
+
+    def advance(self):
+        """Compute the next generation, evaluating only the active region."""
+        life = self.life
+        world = self.world
+        table = self.table
+        terrain_base = self.terrain_base
+        void_cells = self.void_cells
+        stride = self.stride
+        nw, n, ne, w, e, sw, s, se = self.offsets
+
+        active = self.active
+        updates = self.updates
+        for p in active:
+            if p in void_cells:
+                continue
+            packed = (NEIGHBOR_WEIGHTS[life[p + nw]] + NEIGHBOR_WEIGHTS[life[p + n]] +
+                      NEIGHBOR_WEIGHTS[life[p + ne]] + NEIGHBOR_WEIGHTS[life[p + w]] +
+                      NEIGHBOR_WEIGHTS[life[p + e]] + NEIGHBOR_WEIGHTS[life[p + sw]] +
+                      NEIGHBOR_WEIGHTS[life[p + s]] + NEIGHBOR_WEIGHTS[life[p + se]])
+            cell = life[p]
+            new_cell = table[terrain_base[p] + cell * CELL_STRIDE + packed]
+            if new_cell != cell:
+                updates.append((p, new_cell))
+
+        active.clear()
+        for p, new_cell in updates:
+            if new_cell == SPAWN_RANDOM:
+                row, col = divmod(p, stride)
+                new_cell = spawn_faction(world.seed, world.generation, row - 1, col - 1)
+            life[p] = new_cell
+            self.changed.add(p)
+            self.mark(p)
+        updates.clear()
+
+    def write_world(self):
+        """Copy the cells changed since the last write into world.life."""
+        life = self.life
+        world_life = self.world.life
+        stride = self.stride
+        width = self.width
+        for p in self.changed:
+            row, col = divmod(p, stride)
+            world_life[(row - 1) * width + col - 1] = life[p]
+        self.changed = set()
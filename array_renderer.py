@@ -0,0 +1,76 @@
+"""Pixel renderer drawing every cell as one colour, for tiny tiles and huge grids.
+
+A few pixels wide sprites are unrecognisable anyway, and blitting one per live
+cell costs a Python call each. ArrayRenderer turns the terrain and buildings
+into palette indices once; every frame it adds the life codes to them, looks
+the colours of the whole grid up with one np.take, straight into the pixels
+of a surface with one pixel per cell, and scales that to the grid's area on
+the screen in one call.
+"""
+import numpy as np
+import pygame
+
+from numpy_engine import terrain_array, life_array, blocked_array
+from rules import TERRAIN_NAMES, GOBLIN, MAGE, CELL_STATES
+
+# Average colours of the terrain sprites
+TERRAIN_COLORS = {
+    "normal_grass": (60, 109, 73),
+    "red_grass": (125, 35, 72),
+    "cobble": (90, 98, 133),
+    "brown_grass": (115, 54, 42),
+    "flower_land": (54, 91, 81)
+}
+BUILDING_COLOR = (30, 20, 15)
+GOBLIN_COLOR = (120, 235, 70)
+MAGE_COLOR = (255, 110, 60)
+
+# Palette code of building tiles, after the terrain codes
+BUILDING = len(TERRAIN_NAMES)
+
+
+def build_palette():
+    """RGB colour of every (terrain or building) * CELL_STATES + cell code."""
+    palette = np.zeros(((BUILDING + 1) * CELL_STATES, 3), dtype=np.uint8)
+    for code, name in enumerate(TERRAIN_NAMES):
+        palette[code * CELL_STATES] = TERRAIN_COLORS[name]
+    palette[BUILDING * CELL_STATES] = BUILDING_COLOR
+    palette[GOBLIN::CELL_STATES] = GOBLIN_COLOR
+    palette[MAGE::CELL_STATES] = MAGE_COLOR
+    return palette
+
+
+PALETTE = build_palette()
+
+
+class ArrayRenderer:
+    """Draws a world with one colour per cell, scaled to size pixels on the screen."""
+
+    def __init__(self, world, size):
+        self.world = world
+        self.size = size
+        # Palette codes of the empty grid, with the world's axes
+        self.base = terrain_array(world) * np.uint8(CELL_STATES)
+        self.base[blocked_array(world)] = BUILDING * CELL_STATES
+        self.codes = np.empty_like(self.base)
+        self.cells = pygame.Surface((world.width, world.height), depth=32)
+        # The palette as pixel values of the surface
+        self.palette = np.array([self.cells.map_rgb(tuple(color)) for color in PALETTE],
+                                dtype=np.uint32)
+        self.scaled = pygame.Surface(size) if size != self.cells.get_size() else self.cells
+
+    def draw(self, screen):
+        """Draw the world's current life at the top left of the screen; returns the rect drawn."""
+        np.add(self.base, life_array(self.world), out=self.codes, casting="unsafe")
+        # pixels2d indexes pixels by (x, y), its transpose is laid out like the grid
+        pixels = pygame.surfarray.pixels2d(self.cells)
+        np.take(self.palette, self.codes, out=pixels.T, mode="clip")
+        # Unlock the surface
+        del pixels
+        if self.scaled is not self.cells:
+            pygame.transform.scale(self.cells, self.size, self.scaled)
+        return screen.blit(self.scaled, (0, 0))
+
+    def restore(self, screen, rect):
+        """Redraw the part of the last frame inside rect, e.g. after text was drawn over it."""
+        screen.blit(self.scaled, rect, rect)
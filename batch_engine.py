@@ -0,0 +1,141 @@
+"""Batched engine stepping many independent worlds of the same size at once.
+
+The terrain and life of B worlds are stacked along a leading batch axis and a
+generation of all of them is one vectorized rule table lookup by a
+numpy_engine.Stepper over the whole stack, so small worlds stop paying Python
+overhead per world. Each world keeps its own seed and generation for flower
+land births.
+
+After every generation each world is checked for extinction, a still life or
+a period 2 oscillation (without random births in between, see cycles.py).
+Settled worlds drop out of the batch; from then on they are advanced for free
+by keeping their one or two repeating states. This is the workhorse for Monte
+Carlo runs of the zone rules, e.g. sweep.py --engine batch.
+"""
+import numpy as np
+
+from counter_rng import MASK64, SPAWN
+from numpy_engine import (terrain_array, life_array, blocked_array, combine,
+                          keyed_spawn_factions, Stepper)
+from rules import EMPTY, SPAWN_RANDOM, compile_rule_table
+
+# Periods of settled worlds; extinct and still worlds repeat every generation
+STILL = 1
+OSCILLATING = 2
+
+
+class BatchEngine:
+    """Steps a list of equally sized worlds together, dropping settled ones from the batch.
+
+    extinct[i] and period[i] (0 while world i is still running, 1 or 2 once it
+    repeats) describe world i; settled_at[i] is the generation it was found
+    to repeat in, or -1.
+    """
+
+    def __init__(self, worlds, rule_table=None):
+        self.worlds = list(worlds)
+        if len({(world.height, world.width) for world in self.worlds}) > 1:
+            raise ValueError("Batched worlds must all have the same size")
+        self.table = np.frombuffer(rule_table or compile_rule_table(), dtype=np.int8)
+        self.sync()
+
+    def sync(self):
+        """Restack the batch from the worlds, forgetting which ones had settled."""
+        worlds = self.worlds
+        count = len(worlds)
+        self.extinct = np.zeros(count, dtype=np.bool_)
+        self.period = np.zeros(count, dtype=np.int8)
+        self.settled_at = np.full(count, -1, dtype=np.int64)
+        # Repeating states of settled worlds, by world position
+        self.phases = {}
+
+        # Running worlds only, in the order of ids
+        self.ids = np.arange(count)
+        self.terrain = np.stack([terrain_array(world) for world in worlds])
+        self.blocked = np.stack([blocked_array(world) for world in worlds])
+        self.stepper = Stepper(self.terrain, self.blocked, self.table)
+        self.life = np.stack([life_array(world) for world in worlds])
+        self.seeds = np.array([world.seed & MASK64 for world in worlds], dtype=np.uint64)
+        self.generation = np.array([world.generation for world in worlds], dtype=np.int64)
+        # State two generations back, and whether each of the last two had a random birth
+        self.previous = None
+        self.spawned = np.ones((2, count), dtype=np.bool_)
+
+    @property
+    def running(self):
+        """Number of worlds that have not settled yet."""
+        return len(self.ids)
+
+    def advance(self):
+        """Next generation of every running world, and which of them had a random birth."""
+        # A new array: the previous two states are kept to detect settled worlds
+        new_life = self.stepper.lookup(self.life, np.empty_like(self.life))
+        # Buildings never hold life
+        new_life[self.blocked] = EMPTY
+
+        # Peaceful births pick their faction at random, keyed by their own world
+        spawn = new_life == SPAWN_RANDOM
+        spawned = spawn.any(axis=(1, 2))
+        if spawned.any():
+            prefixes = combine(combine(self.seeds, SPAWN), self.generation)
+            worlds, rows, cols = np.nonzero(spawn)
+            new_life[worlds, rows, cols] = keyed_spawn_factions(prefixes[worlds], rows, cols)
+        return new_life, spawned
+
+    def step(self, generations=1):
+        """Advance every world the given number of generations."""
+        targets = [world.generation + generations for world in self.worlds]
+        for _ in range(generations):
+            if not len(self.ids):
+                break
+            new_life, spawned = self.advance()
+            self.generation += 1
+            self.spawned = np.stack([self.spawned[1], spawned])
+
+            extinct = ~new_life.any(axis=(1, 2))
+            still = (new_life == self.life).all(axis=(1, 2))
+            oscillating = np.zeros_like(still)
+            if self.previous is not None:
+                oscillating = (new_life == self.previous).all(axis=(1, 2)) & \
+                    ~self.spawned.any(axis=0)
+
+            self.previous, self.life = self.life, new_life
+            settled = extinct | still | oscillating
+            if settled.any():
+                self.retire(settled, extinct, oscillating & ~still)
+
+        self.write_worlds(targets)
+
+    def retire(self, settled, extinct, oscillating):
+        """Drop the settled worlds from the batch, keeping their repeating states."""
+        for position in np.flatnonzero(settled):
+            world = self.ids[position]
+            self.extinct[world] = extinct[position]
+            self.settled_at[world] = self.generation[position]
+            if oscillating[position]:
+                self.period[world] = OSCILLATING
+                self.phases[world] = (self.life[position].copy(), self.previous[position].copy())
+            else:
+                self.period[world] = STILL
+                self.phases[world] = (self.life[position].copy(),)
+
+        keep = ~settled
+        self.ids = self.ids[keep]
+        self.terrain = self.terrain[keep]
+        self.blocked = self.blocked[keep]
+        self.stepper = Stepper(self.terrain, self.blocked, self.table)
+        self.life = self.life[keep]
+        self.previous = self.previous[keep]
+        self.seeds = self.seeds[keep]
+        self.generation = self.generation[keep]
+        self.spawned = self.spawned[:, keep]
+
+    def write_worlds(self, targets):
+        """Copy every world's state at its target generation into world.life."""
+        for position, world in enumerate(self.ids):
+            life_array(self.worlds[world])[:] = self.life[position]
+            self.worlds[world].generation = int(self.generation[position])
+        for world, phases in self.phases.items():
+            generations = targets[world] - int(self.settled_at[world])
+            life_array(self.worlds[world])[:] = phases[generations % len(phases)]
+            self.worlds[world].generation = targets[world]
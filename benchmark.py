@@ -0,0 +1,258 @@
+"""Benchmarks for the stepping engines, terrain generator and renderer.
+
+Times update_life_grid (and every other engine), count_neighbors,
+generate_clustered_terrain, place_buildings, initialize_life_grid and
+draw_everything over a range of square grid sizes and life densities with
+fixed seeds, and writes the results to a JSON file so runs can be compared.
+Rendering uses SDL's dummy video driver, so no window is opened.
+
+    python benchmark.py --sizes 40 200 1000 2000 --densities 0.05 0.3
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Render off-screen; must be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from engines import ENGINE_NAMES, available_engines, create_engine, close_engine, advance_generation
+from rules import EMPTY, GOBLIN, MAGE, TERRAIN_NAMES
+from world import (World, generate_clustered_terrain, place_buildings,
+                   initialize_life_grid, count_neighbors)
+
+# Largest grid side each slow benchmark runs at unless --no-limits is given.
+# The terrain generator runs a flood fill per cell and already takes minutes at 100x100.
+SIZE_LIMITS = {
+    "generate_clustered_terrain": 60,
+    "count_neighbors": 500,
+    "step/python": 500,
+    "step/lookup": 1000,
+    "step/active": 1000,
+    "step/sparse": 1000,
+    "step/sparse_map": 1000,
+    "step/hashlife": 1000
+}
+
+# Side of the square terrain blocks in synthetic worlds
+BLOCK_SIZE = 8
+# Side of the world whose terrain the sparse engine tiles over its map
+MAP_WORLD_SIZE = 40
+# Screen side the renderer benchmark scales the tile size to
+SCREEN_SIZE = 800
+
+
+def synthetic_world(size, density, seed):
+    """A size x size world with blocky random terrain, both buildings and random life.
+
+    Generating real terrain is far too slow for large grids, so everything but
+    the terrain generator benchmark runs on these.
+    """
+    rng = random.Random(seed)
+    world = World(size, size, seed)
+    world.clusters = {"red_grass": [], "cobble": []}
+    for top in range(0, size, BLOCK_SIZE):
+        for left in range(0, size, BLOCK_SIZE):
+            code = rng.randrange(len(TERRAIN_NAMES))
+            rows = range(top, min(top + BLOCK_SIZE, size))
+            cols = range(left, min(left + BLOCK_SIZE, size))
+            for row in rows:
+                start = world.index(row, left)
+                world.terrain[start:start + len(cols)] = bytes([code]) * len(cols)
+
+            # A handful of clusters is plenty for place_buildings
+            name = TERRAIN_NAMES[code]
+            if name in world.clusters and len(world.clusters[name]) < 16:
+                world.clusters[name].append({(col, row) for row in rows for col in cols})
+
+    place_buildings(world)
+    fill_life(world, density, seed)
+    return world
+
+
+def fill_life(world, density, seed):
+    """Give every open cell a goblin or mage with the given probability."""
+    rng = random.Random(seed)
+    life = world.life
+    for index in range(len(life)):
+        if world.blocked[index] or rng.random() >= density:
+            life[index] = EMPTY
+        else:
+            life[index] = GOBLIN if rng.random() < 0.5 else MAGE
+
+
+def measure(func, setup=None, min_time=0.5, max_runs=5):
+    """Run func until min_time has been spent or max_runs reached; setup is not timed."""
+    times = []
+    while len(times) < max_runs and sum(times) < min_time:
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"runs": len(times), "min_s": min(times), "median_s": statistics.median(times)}
+
+
+def bench_terrain(size, density, seed):
+    """Time the clustered terrain generator."""
+    world = World(size, size, seed)
+    return measure(lambda: generate_clustered_terrain(world), max_runs=3)
+
+
+def bench_buildings(size, density, seed):
+    """Time building placement."""
+    world = synthetic_world(size, density, seed)
+    return measure(lambda: place_buildings(world))
+
+
+def bench_initialize(size, density, seed):
+    """Time the initial population."""
+    world = synthetic_world(size, density, seed)
+    return measure(lambda: initialize_life_grid(world))
+
+
+def bench_count_neighbors(size, density, seed):
+    """Time counting the goblin neighbors of every cell."""
+    world = synthetic_world(size, density, seed)
+
+    def count_all():
+        for row in range(size):
+            for col in range(size):
+                count_neighbors(world, row, col, GOBLIN)
+
+    return measure(count_all)
+
+
+def bench_step(engine_name):
+    """Benchmark function timing one generation of the named engine."""
+    def bench(size, density, seed):
+        world = synthetic_world(size, density, seed)
+        initial = world.life[:]
+        engine = create_engine(engine_name, world, workers=os.cpu_count())
+
+        def reset():
+            # Always step the same starting population
+            world.life[:] = initial
+            world.generation = 0
+            if engine is not None:
+                engine.sync()
+
+        try:
+            return measure(lambda: advance_generation(world, engine), setup=reset)
+        finally:
+            close_engine(engine)
+    return bench
+
+
+def bench_sparse_map(size, density, seed):
+    """Time one generation of a size x size sparse map tiled with a small world."""
+    world = synthetic_world(min(size, MAP_WORLD_SIZE), density, seed)
+    engine = create_engine("sparse", world, map_size=(size, size), map_density=density)
+    initial = dict(engine.live)
+
+    def reset():
+        engine.live = dict(initial)
+        world.generation = 0
+
+    return measure(lambda: advance_generation(world, engine), setup=reset)
+
+
+def bench_draw(size, density, seed):
+    """Time drawing a full frame, scaled so the grid fills the screen."""
+    import pygame
+    import game
+
+    world = synthetic_world(size, density, seed)
+    pygame.init()
+    game.TILE_SIZE = max(1, SCREEN_SIZE // size)
+    game.paused = True
+    game.screen = pygame.display.set_mode((size * game.TILE_SIZE, size * game.TILE_SIZE))
+    game.load_sprites()
+    return measure(lambda: game.draw_everything(world))
+
+
+def git_revision():
+    """Commit hash of the benchmarked tree, if it is a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 200, 1000, 2000],
+                        help="Grid sides to benchmark")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.05, 0.3],
+                        help="Fractions of cells starting alive")
+    parser.add_argument("--engines", nargs="+", choices=ENGINE_NAMES,
+                        help="Engines to step (default: all that are installed)")
+    parser.add_argument("--only", nargs="+",
+                        help="Only run benchmarks whose name starts with one of these")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for worlds and spawns")
+    parser.add_argument("--no-limits", action="store_true",
+                        help="Run slow benchmarks at every size instead of skipping large grids")
+    parser.add_argument("--no-render", action="store_true", help="Skip the renderer benchmark")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="JSON file the results are written to")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    # Sprites are loaded relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # Benchmarks that do not depend on the life density run once per size
+    benchmarks = [
+        ("generate_clustered_terrain", bench_terrain, False),
+        ("place_buildings", bench_buildings, False),
+        ("initialize_life_grid", bench_initialize, False),
+        ("count_neighbors", bench_count_neighbors, True)
+    ]
+    benchmarks += [("step/" + name, bench_step(name), True)
+                   for name in args.engines or available_engines()]
+    if "sparse" in (args.engines or ENGINE_NAMES):
+        benchmarks.append(("step/sparse_map", bench_sparse_map, True))
+    if not args.no_render:
+        benchmarks.append(("draw_everything", bench_draw, True))
+    if args.only:
+        benchmarks = [bench for bench in benchmarks if bench[0].startswith(tuple(args.only))]
+
+    results = []
+    for name, bench, uses_density in benchmarks:
+        for size in args.sizes:
+            for density in args.densities if uses_density else [None]:
+                result = {"benchmark": name, "size": size, "density": density}
+                limit = SIZE_LIMITS.get(name)
+                if limit and size > limit and not args.no_limits:
+                    result["skipped"] = f"larger than {limit}x{limit}, use --no-limits"
+                    print(f"{name:28} {size:>5} {density or '':>5}  skipped")
+                else:
+                    result.update(bench(size, density or 0.0, args.seed))
+                    print(f"{name:28} {size:>5} {density or '':>5}  "
+                          f"{result['median_s'] * 1000:10.2f} ms  ({result['runs']} runs)")
+                results.append(result)
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "revision": git_revision(),
+            "seed": args.seed
+        },
+        "results": results
+    }
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
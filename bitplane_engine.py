@@ -0,0 +1,188 @@
+"""Bit-packed stepping engine for the Goblin vs Mage game of life.
+
+Goblins and mages are kept in two bitplanes of uint64 words (64 cells per
+word, one row of words per grid row). Neighbor counts are computed for 64
+cells at a time with bit-sliced adders into four count bitplanes, and the
+zone rules become boolean formulas over terrain bitmasks and those counts,
+generated once from the compiled rule table.
+"""
+import numpy as np
+
+from numpy_engine import terrain_array, life_array, blocked_array, spawn_factions
+from rules import (EMPTY, GOBLIN, MAGE, SPAWN_RANDOM,
+                   TERRAIN_CODES, NEIGHBOR_STATES, compile_rule_table, rule_index)
+
+WORD_BITS = 64
+COUNT_BITS = 4
+ONE = np.uint64(1)
+LAST_BIT = np.uint64(WORD_BITS - 1)
+
+
+def pack(mask, words):
+    """Pack a boolean (height, width) array into (height, words) uint64 bitplanes."""
+    height, width = mask.shape
+    padded = np.zeros((height, words * WORD_BITS), dtype=bool)
+    padded[:, :width] = mask
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8").astype(np.uint64)
+
+
+def unpack(plane, width):
+    """Unpack uint64 bitplanes back into a boolean (height, width) array."""
+    bits = np.unpackbits(plane.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+    return bits[:, :width].astype(bool)
+
+
+def neighbor_planes(plane):
+    """Yield the 8 bitplanes holding each cell's neighbor in every direction."""
+    # Horizontal shifts carry the edge bit over from the adjacent word
+    west = plane << ONE
+    west[:, 1:] |= plane[:, :-1] >> LAST_BIT
+    east = plane >> ONE
+    east[:, :-1] |= plane[:, 1:] << LAST_BIT
+
+    for row_plane in (plane, west, east):
+        up = np.zeros_like(row_plane)
+        up[1:] = row_plane[:-1]
+        down = np.zeros_like(row_plane)
+        down[:-1] = row_plane[1:]
+        yield up
+        yield down
+    yield west
+    yield east
+
+
+def count_bits(plane):
+    """Count neighbors of every cell with bit-sliced adders, least significant bit first."""
+    counts = [np.zeros_like(plane) for _ in range(COUNT_BITS)]
+    for neighbors in neighbor_planes(plane):
+        carry = neighbors
+        for bit in range(COUNT_BITS):
+            next_carry = counts[bit] & carry
+            counts[bit] ^= carry
+            carry = next_carry
+    return counts
+
+
+def equals(counts, value):
+    """Bitplane of the cells whose neighbor count equals value."""
+    result = None
+    for bit, count in enumerate(counts):
+        term = count if value >> bit & 1 else ~count
+        result = term if result is None else result & term
+    return result
+
+
+def compile_formulas(rule_table):
+    """Turn the rule table into (terrain, cell, result, [(goblin counts, mage counts)]) formulas.
+
+    Goblin counts that lead to the same result for the same set of mage counts
+    are grouped, so each formula is a short OR of (goblin == any of) AND
+    (mage == any of) terms.
+    """
+    formulas = []
+    for terrain in TERRAIN_CODES.values():
+        for cell in (EMPTY, GOBLIN, MAGE):
+            for result in (GOBLIN, MAGE, SPAWN_RANDOM):
+                groups = {}
+                for goblin_count in range(NEIGHBOR_STATES):
+                    mage_counts = tuple(
+                        mage_count for mage_count in range(NEIGHBOR_STATES)
+                        if rule_table[rule_index(terrain, cell, goblin_count, mage_count)] == result)
+                    if mage_counts:
+                        groups.setdefault(mage_counts, []).append(goblin_count)
+                if groups:
+                    terms = [(tuple(goblin_counts), mage_counts)
+                             for mage_counts, goblin_counts in groups.items()]
+                    formulas.append((terrain, cell, result, terms))
+    return formulas
+
+
+class BitplaneEngine:
+    """Steps two packed bitplanes (goblins, mages) 64 cells per machine word."""
+
+    def __init__(self, world, rule_table=None):
+        self.world = world
+        self.height = world.height
+        self.width = world.width
+        self.words = -(-self.width // WORD_BITS)
+        self.formulas = compile_formulas(rule_table or compile_rule_table())
+
+        terrain = terrain_array(world)
+        self.terrain_masks = {code: pack(terrain == code, self.words)
+                              for code in TERRAIN_CODES.values()}
+
+        # Cells that can hold life: inside the grid and not under a building
+        self.open = pack(~blocked_array(world), self.words)
+
+        self.life = life_array(world)
+        self.sync()
+
+    def sync(self):
+        """Pick up edits made directly to world.life."""
+        self.goblins = pack(self.life == GOBLIN, self.words)
+        self.mages = pack(self.life == MAGE, self.words)
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell, e.g. after a mouse click."""
+        word, bit = divmod(col, WORD_BITS)
+        mask = ONE << np.uint64(bit)
+        self.goblins[row, word] &= ~mask
+        self.mages[row, word] &= ~mask
+        if self.life[row, col] == GOBLIN:
+            self.goblins[row, word] |= mask
+        elif self.life[row, col] == MAGE:
+            self.mages[row, word] |= mask
+
+    def step(self, generations=1):
+        """Advance the world the given number of generations.
+
+        The planes stay packed in between, world.life is only written at the end.
+        """
+        for _ in range(generations):
+            self.advance()
+            self.world.generation += 1
+        self.life[:] = unpack(self.goblins, self.width) * GOBLIN + \
+            unpack(self.mages, self.width) * MAGE
+
+    def advance(self):
+        """Compute the next generation of the goblin and mage planes."""
+        goblin_counts = count_bits(self.goblins)
+        mage_counts = count_bits(self.mages)
+        goblin_equals = {}
+        mage_equals = {}
+        cells = {EMPTY: ~(self.goblins | self.mages), GOBLIN: self.goblins, MAGE: self.mages}
+
+        new_planes = {result: np.zeros_like(self.goblins)
+                      for result in (GOBLIN, MAGE, SPAWN_RANDOM)}
+        for terrain, cell, result, terms in self.formulas:
+            matches = None
+            for goblin_values, mage_values in terms:
+                goblin_match = None
+                for value in goblin_values:
+                    if value not in goblin_equals:
+                        goblin_equals[value] = equals(goblin_counts, value)
+                    goblin_match = goblin_equals[value] if goblin_match is None \
+                        else goblin_match | goblin_equals[value]
+                mage_match = None
+                for value in mage_values:
+                    if value not in mage_equals:
+                        mage_equals[value] = equals(mage_counts, value)
+                    mage_match = mage_equals[value] if mage_match is None \
+                        else mage_match | mage_equals[value]
+                term = goblin_match & mage_match
+                matches = term if matches is None else matches | term
+            new_planes[result] |= self.terrain_masks[terrain] & cells[cell] & matches
+
+        # Peaceful births are rare, so their factions are decided cell by cell
+        spawn = new_planes[SPAWN_RANDOM] & self.open
+        if spawn.any():
+            rows, cols = np.nonzero(unpack(spawn, self.width))
+            factions = spawn_factions(self.world.seed, self.world.generation, rows, cols)
+            words = cols // WORD_BITS
+            bits = ONE << (cols % WORD_BITS).astype(np.uint64)
+            for faction in (GOBLIN, MAGE):
+                chosen = factions == faction
+                np.bitwise_or.at(new_planes[faction], (rows[chosen], words[chosen]), bits[chosen])
+
+        self.goblins = new_planes[GOBLIN] & self.open
+        self.mages = new_planes[MAGE] & self.open
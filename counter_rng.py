@@ -0,0 +1,74 @@
+"""Counter-based random numbers for the Goblin vs Mage game of life.
+
+Every random decision is a pure function of (seed, generation, row, col,
+purpose): the key is mixed into 64 random bits with the SplitMix64 finalizer
+instead of being drawn from a shared generator. Engines can therefore visit
+cells in any order, vectorize, or split the grid across processes and still
+make exactly the same decisions, and the seed alone determines a run.
+"""
+import random
+
+from rules import GOBLIN, MAGE
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+MIX_MULTIPLIERS = (0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+MIX_SHIFTS = (30, 27, 31)
+
+# Purposes, so different decisions about the same cell are independent
+TERRAIN = 1
+BUILDINGS = 2
+INITIAL_LIFE = 3
+INITIAL_NEUTRAL_LIFE = 4
+INITIAL_FACTION = 5
+SPAWN = 6
+ENTITIES = 7
+RESET = 8
+ZOBRIST = 9
+
+
+def mix(value):
+    """SplitMix64 finalizer: scramble a 64-bit value."""
+    value = (value ^ value >> MIX_SHIFTS[0]) * MIX_MULTIPLIERS[0] & MASK64
+    value = (value ^ value >> MIX_SHIFTS[1]) * MIX_MULTIPLIERS[1] & MASK64
+    return value ^ value >> MIX_SHIFTS[2]
+
+
+def combine(bits, value):
+    """Fold one more key component into a hash."""
+    return mix((bits ^ value) + GOLDEN_GAMMA & MASK64)
+
+
+def key_prefix(seed, generation, purpose):
+    """Hash of the part of a key shared by all cells of a generation."""
+    return combine(combine(seed & MASK64, purpose), generation)
+
+
+def hash_bits(seed, generation, row, col, purpose):
+    """64 random bits for one decision."""
+    return combine(combine(key_prefix(seed, generation, purpose), row), col)
+
+
+def random_float(seed, generation, row, col, purpose):
+    """Uniform float in [0, 1) for one decision."""
+    return (hash_bits(seed, generation, row, col, purpose) >> 11) * 2.0 ** -53
+
+
+def random_stream(seed, generation, row, col, purpose):
+    """random.Random seeded from one key, for inherently sequential algorithms."""
+    return random.Random(hash_bits(seed, generation, row, col, purpose))
+
+
+def spawn_faction(seed, generation, row, col):
+    """Faction of a peaceful birth at a cell: the top hash bit picks goblin or mage."""
+    return MAGE if hash_bits(seed, generation, row, col, SPAWN) >> 63 else GOBLIN
+
+
+def new_seed():
+    """Fresh seed for a run started without --seed."""
+    return random.getrandbits(63)
+
+
+def next_seed(seed):
+    """Seed of the world that replaces one with the given seed (the R key)."""
+    return hash_bits(seed, 0, 0, 0, RESET) >> 1
@@ -0,0 +1,153 @@
+"""Extinction, still life and cycle detection with incremental Zobrist hashing.
+
+A CycleDetector keeps a 64-bit Zobrist hash of world.life, the XOR of one key
+per live cell, and updates it after every generation by XOR-ing out the old
+and in the new key of the changed cells only. A bounded table of recent
+hashes reveals when the battle returns to an earlier state; from then on any
+later generation can be reached with modular arithmetic instead of stepping.
+
+Flower land births pick their faction by generation, so a repeated state
+only repeats forever if no random birth happened along the way. Such
+repetitions are not reported.
+"""
+from array import array
+from collections import deque, namedtuple
+
+from counter_rng import ZOBRIST, hash_bits
+from engines import advance_generation
+from rules import EMPTY, SPAWN_RANDOM, compile_rule_table, rule_index
+
+# Generations of hashes kept to find cycles in
+DEFAULT_HISTORY = 64
+
+EXTINCT = "extinct"
+STILL_LIFE = "still life"
+OSCILLATOR = "oscillator"
+
+# The world repeats the state of generation start every period generations
+Cycle = namedtuple("Cycle", ["start", "period", "kind"])
+
+
+def zobrist_key(index, cell):
+    """Hash key of a cell state at a position in the flat life array (0 for empty)."""
+    return hash_bits(0, 0, index, cell, ZOBRIST) if cell != EMPTY else 0
+
+
+def zobrist_hash(life):
+    """Zobrist hash of a whole life array."""
+    value = 0
+    for index, cell in enumerate(life):
+        if cell != EMPTY:
+            value ^= zobrist_key(index, cell)
+    return value
+
+
+def describe(cycle):
+    """Human readable description of a cycle."""
+    if cycle.kind == OSCILLATOR:
+        return f"period {cycle.period} oscillator since generation {cycle.start}"
+    return f"{cycle.kind} since generation {cycle.start}"
+
+
+class CycleDetector:
+    """Watches a world generation by generation and reports when it starts repeating."""
+
+    def __init__(self, world, rule_table=None, history=DEFAULT_HISTORY):
+        self.world = world
+        self.table = rule_table or compile_rule_table()
+        self.history = history
+        self.reset()
+
+    def reset(self):
+        """Start over from the current state, e.g. after the user edited world.life."""
+        world = self.world
+        self.generation = world.generation
+        self.previous = array("b", world.life)
+        self.hash = zobrist_hash(world.life)
+        self.seen = {self.hash: self.generation}
+        self.recent = deque([(self.hash, self.generation)])
+        # Last generation that was reached through a random birth
+        self.last_random = self.generation
+        self.cycle = None
+
+    def changed_cells(self):
+        """Indices of the cells that differ from the previous generation."""
+        life = self.world.life
+        previous = self.previous
+        width = self.world.width
+        for start in range(0, len(life), width):
+            if life[start:start + width] != previous[start:start + width]:
+                for index in range(start, start + width):
+                    if life[index] != previous[index]:
+                        yield index
+
+    def random_birth(self, index):
+        """Whether the cell at index was born with a random faction."""
+        world = self.world
+        row, col = divmod(index, world.width)
+        counts = [0, 0, 0]
+        for y in range(max(0, row - 1), min(world.height, row + 2)):
+            for x in range(max(0, col - 1), min(world.width, col + 2)):
+                if y != row or x != col:
+                    counts[self.previous[y * world.width + x]] += 1
+        return self.table[rule_index(world.terrain[index], EMPTY, counts[1], counts[2])] \
+            == SPAWN_RANDOM
+
+    def observe(self):
+        """Account for the generation just stepped; the Cycle once the world repeats, else None."""
+        world = self.world
+        if world.generation != self.generation + 1:
+            # Generations were skipped, nothing is known about the ones in between
+            self.reset()
+            return None
+        self.generation = world.generation
+
+        # Births are judged by the neighbors of the previous generation, so
+        # nothing is written to self.previous before every cell is classified
+        changed = list(self.changed_cells())
+        for index in changed:
+            old = self.previous[index]
+            self.hash ^= zobrist_key(index, old) ^ zobrist_key(index, world.life[index])
+            if old == EMPTY and self.last_random != self.generation and self.random_birth(index):
+                self.last_random = self.generation
+        for index in changed:
+            self.previous[index] = world.life[index]
+
+        if self.cycle is not None:
+            # Without random births a cycle repeats until world.life is edited
+            return self.cycle
+
+        if not changed:
+            kind = EXTINCT if world.life.count(EMPTY) == len(world.life) else STILL_LIFE
+            self.cycle = Cycle(self.generation - 1, 1, kind)
+            return self.cycle
+
+        start = self.seen.get(self.hash)
+        if start is not None and self.last_random <= start:
+            self.cycle = Cycle(start, self.generation - start, OSCILLATOR)
+            return self.cycle
+
+        self.seen[self.hash] = self.generation
+        self.recent.append((self.hash, self.generation))
+        if len(self.recent) > self.history:
+            old_hash, old_generation = self.recent.popleft()
+            if self.seen.get(old_hash) == old_generation:
+                del self.seen[old_hash]
+        return None
+
+    def jump(self, engine, generation):
+        """Bring the world to a later generation stepping at most one period; returns the steps."""
+        cycle = self.cycle
+        world = self.world
+        if generation < world.generation:
+            raise ValueError("Can only jump forward in time")
+        steps = (generation - world.generation) % cycle.period
+        advance_generation(world, engine, steps)
+        world.generation = generation
+        if steps:
+            self.reset()
+            self.cycle = cycle
+        else:
+            # Same state as before, only the generation number moved on
+            self.generation = generation
+        return steps
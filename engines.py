@@ -0,0 +1,95 @@
+"""Registry of the stepping engines and helpers to drive them.
+
+Every engine is a class taking a World (plus the compiled rule table) whose
+step(generations=1) advances world.life, keeping the generations in between
+in its own buffers and writing world.life once at the end; sync() and
+cell_changed() tell it about edits made directly to world.life. "python" is
+the reference update_life_grid() and needs no engine object.
+"""
+import importlib
+
+from world import update_life_grid
+
+# Alternative stepping engines, imported on demand so their dependencies stay optional
+ENGINES = {
+    "lookup": ("lookup_engine", "LookupEngine"),
+    "active": ("active_engine", "ActiveEngine"),
+    "sparse": ("sparse_engine", "SparseEngine"),
+    "hashlife": ("hashlife_engine", "HashlifeEngine"),
+    "numpy": ("numpy_engine", "NumpyEngine"),
+    "bitplane": ("bitplane_engine", "BitplaneEngine"),
+    "parallel": ("parallel_engine", "ParallelEngine")
+}
+ENGINE_NAMES = ["python"] + list(ENGINES)
+# Engines that need numpy
+NUMPY_ENGINES = ("numpy", "bitplane", "parallel")
+# Engines that can feed zone_stats.ZoneStats while stepping
+STATS_ENGINES = ("lookup", "numpy")
+# Engine that can run a map larger than the world
+MAP_ENGINE = "sparse"
+
+
+def create_engine(name, world, rule_table=None, workers=None, stats=None, map_size=None,
+                  map_density=None):
+    """Create the named stepping engine for a world (None for update_life_grid).
+
+    map_size (width, height) makes the sparse engine run a larger map tiled
+    with the world's terrain, seeded like the world, or with map_density as
+    the chance of a goblin or mage on every map cell outside the world.
+    """
+    if stats and name not in STATS_ENGINES:
+        raise ValueError(f"The {name} engine does not collect zone statistics")
+    if map_density is not None and not map_size:
+        raise ValueError("A map density needs a map size")
+    if map_size and name != MAP_ENGINE:
+        raise ValueError(f"Only the {MAP_ENGINE} engine runs maps larger than the world")
+    if map_size and (map_size[0] < world.width or map_size[1] < world.height):
+        raise ValueError(f"A {map_size[0]}x{map_size[1]} map does not hold the "
+                         f"{world.width}x{world.height} world")
+    if name == "python":
+        return None
+
+    options = {"workers": workers} if name == "parallel" else {}
+    if stats:
+        options["stats"] = stats
+    if map_size:
+        options["width"], options["height"] = map_size
+    module_name, class_name = ENGINES[name]
+    engine_class = getattr(importlib.import_module(module_name), class_name)
+    engine = engine_class(world, rule_table=rule_table, **options)
+    if map_density is not None:
+        engine.populate(map_density, map_density)
+    elif map_size:
+        engine.populate()
+    return engine
+
+
+def available_engines():
+    """Engine names whose dependencies are installed."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return [name for name in ENGINE_NAMES if name not in NUMPY_ENGINES]
+    return ENGINE_NAMES
+
+
+def population(world, engine):
+    """Live (goblins, mages) of the whole battlefield, which a sparse engine's map may extend."""
+    if engine is not None and hasattr(engine, "populate"):
+        return engine.population()
+    return world.population()
+
+
+def close_engine(engine):
+    """Release the resources (worker processes, shared memory) held by an engine."""
+    if hasattr(engine, "close"):
+        engine.close()
+
+
+def advance_generation(world, engine, generations=1):
+    """Advance the world by the given number of generations using the given engine."""
+    if engine is None:
+        for _ in range(generations):
+            update_life_grid(world)
+    else:
+        engine.step(generations)
@@ -0,0 +1,495 @@
+"""Pygame window for the Goblin vs Mage game of life."""
+import os
+import re
+import time
+import pygame
+
+from engines import create_engine, close_engine, advance_generation
+from rules import EMPTY, GOBLIN, MAGE, TERRAIN_NAMES
+from counter_rng import next_seed
+from hud import Hud, Meters
+from cycles import CycleDetector, describe
+from recording import CHANGES, Recorder, xor_bytes
+from rewind import History
+from world import BUILDING_SIZE, create_world, add_random_entities
+
+try:
+    from array_renderer import ArrayRenderer
+except ImportError:
+    # Without numpy every tile size is drawn with sprites
+    ArrayRenderer = None
+
+# Generations skipped by the F and Shift+F keys
+FAST_FORWARD = 100
+FAST_FORWARD_FAR = 1000
+
+# A live cell in the bytes of a life grid
+LIVE_CELLS = re.compile(b"[%c%c]" % (GOBLIN, MAGE))
+
+# Tiles smaller than this many pixels are drawn as one colour each by an ArrayRenderer
+ARRAY_TILE_SIZE = 4
+
+# Cached terrain and buildings of the world on screen, see build_background(),
+# or the ArrayRenderer drawing it when the tiles are tiny
+background = None
+renderer = None
+# Life grid bytes on screen and the rect the HUD covers, see draw_frame()
+displayed = None
+hud_rect = None
+# HUD text and the meters shown in it, if any
+hud = None
+meters = None
+
+# Key help of the game and of the replay viewer
+INSTRUCTIONS = [
+    "SPACE: Pause/Resume",
+    "R: Reset terrain",
+    "C: Clear life grid",
+    "G: Add goblins",
+    "M: Add mages",
+    f"F: Skip {FAST_FORWARD} generations",
+    f"Shift+F: Skip {FAST_FORWARD_FAR} generations",
+    "LEFT/RIGHT: Rewind/Replay generations"
+]
+REPLAY_INSTRUCTIONS = [
+    "SPACE: Play/Pause",
+    "LEFT/RIGHT: Previous/next generation",
+    f"DOWN/UP: {FAST_FORWARD} generations back/ahead",
+    "HOME/END: First/last generation"
+]
+
+
+def load_sprites():
+    """Load all sprites and scale them to the tile size."""
+    global terrain_sprites
+
+    # Load terrain sprites
+    sprite_paths = {
+        "normal_grass": os.path.join("Sprites", "normal_grass.png"),
+        "cobble": os.path.join("Sprites", "cobble.png"),
+        "brown_grass": os.path.join("Sprites", "brown_grass.png"),
+        "red_grass": os.path.join("Sprites", "red_grass.png"),
+        "flower_land": os.path.join("Sprites", "flower_land.png"),
+        "hut": os.path.join("Sprites", "hut.png"),
+        "castle": os.path.join("Sprites", "castle.png"),
+        "goblin": os.path.join("Sprites", "goblin.png"),
+        "mage": os.path.join("Sprites", "mage.png")
+    }
+
+    terrain_sprites = {key: pygame.image.load(
+        path) for key, path in sprite_paths.items()}
+    scale_sprites()
+
+
+def scale_sprites():
+    """Scales all terrain sprites to fit the grid."""
+    global terrain_sprites, live_sprites
+
+    # Scale all sprites to fit one tile
+    for key, sprite in terrain_sprites.items():
+        terrain_sprites[key] = pygame.transform.scale(
+            sprite, (TILE_SIZE, TILE_SIZE))
+
+    # Create larger versions of buildings (both same size)
+    terrain_sprites["large_hut"] = pygame.transform.scale(
+        terrain_sprites["hut"],
+        (TILE_SIZE * BUILDING_SIZE, TILE_SIZE * BUILDING_SIZE)
+    )
+
+    terrain_sprites["large_castle"] = pygame.transform.scale(
+        terrain_sprites["castle"],
+        (TILE_SIZE * BUILDING_SIZE, TILE_SIZE * BUILDING_SIZE)
+    )
+    live_sprites = {GOBLIN: terrain_sprites["goblin"], MAGE: terrain_sprites["mage"]}
+
+    # The background was composited from the old sprites
+    reset_background()
+
+
+def grid_size(world):
+    """Size of a world's grid on the screen, in pixels."""
+    return world.width * TILE_SIZE, world.height * TILE_SIZE
+
+
+def array_mode():
+    """Whether the tiles are too small for sprites and are drawn by an ArrayRenderer."""
+    return ArrayRenderer is not None and TILE_SIZE < ARRAY_TILE_SIZE
+
+
+def layer_outdated(world):
+    """Whether the background or renderer is missing or was made for another grid."""
+    if array_mode():
+        return renderer is None or renderer.world is not world or \
+            renderer.size != grid_size(world)
+    return background is None or background.get_size() != grid_size(world)
+
+
+def build_background(world):
+    """Pre-composite the terrain and buildings of a world into one surface."""
+    global background, renderer
+    if array_mode():
+        renderer = ArrayRenderer(world, grid_size(world))
+        return
+    background = pygame.Surface(grid_size(world))
+    for row in range(world.height):
+        for col in range(world.width):
+            background.blit(terrain_sprites[TERRAIN_NAMES[world.terrain[world.index(row, col)]]],
+                            (col * TILE_SIZE, row * TILE_SIZE))
+
+    # Nothing lives on building tiles, so buildings can go under the life layer
+    if world.hut_pos:
+        background.blit(terrain_sprites["large_hut"],
+                        (world.hut_pos[0] * TILE_SIZE, world.hut_pos[1] * TILE_SIZE))
+
+    if world.castle_pos:
+        background.blit(terrain_sprites["large_castle"],
+                        (world.castle_pos[0] * TILE_SIZE, world.castle_pos[1] * TILE_SIZE))
+    if pygame.display.get_surface():
+        background = background.convert()
+
+
+def reset_background():
+    """Forget the background, e.g. after the terrain was regenerated."""
+    global background, renderer, displayed
+    background = renderer = None
+    displayed = None
+
+
+def draw_tiles(cells, width, row, first, last):
+    """Redraw tiles first to last (exclusive) of a row from the background and life; returns their rect."""
+    rect = pygame.Rect(first * TILE_SIZE, row * TILE_SIZE, (last - first) * TILE_SIZE, TILE_SIZE)
+    screen.blit(background, rect, rect)
+    start = row * width
+    for match in LIVE_CELLS.finditer(cells, start + first, start + last):
+        screen.blit(live_sprites[match[0][0]], ((match.start() - start) * TILE_SIZE, rect.y))
+    return rect
+
+
+def update_hud(world, cycle=None, instructions=INSTRUCTIONS):
+    """Set the status, meter and key help lines of the HUD; returns whether any changed."""
+    global hud
+    if hud is None:
+        hud = Hud()
+    status_text = f"{'PAUSED' if paused else 'RUNNING'} - generation {world.generation}"
+    if cycle:
+        status_text += f" - {describe(cycle)}"
+    return hud.update([status_text] + (meters.lines() if meters else []) + instructions)
+
+
+def draw_everything(world, cycle=None, instructions=INSTRUCTIONS):
+    """Draw the terrain, buildings, and life cells."""
+    global displayed, hud_rect
+    # Terrain and buildings only change with the world, blit them in one go
+    if layer_outdated(world):
+        build_background(world)
+    cells = world.life.tobytes()
+    if array_mode():
+        renderer.draw(screen)
+    else:
+        screen.blit(background, (0, 0))
+
+        # Draw life cells on top, found without visiting the empty ones
+        for match in LIVE_CELLS.finditer(cells):
+            row, col = divmod(match.start(), world.width)
+            screen.blit(live_sprites[match[0][0]], (col * TILE_SIZE, row * TILE_SIZE))
+
+    displayed = cells
+    update_hud(world, cycle, instructions)
+    hud_rect = hud.draw(screen)
+
+
+def draw_frame(world, cycle=None, instructions=INSTRUCTIONS):
+    """Bring the screen up to date with the world; returns the rects to update on the display.
+
+    Only the tiles whose occupant changed since the last frame are redrawn,
+    plus the HUD and the tiles it covered when its text changed or it was drawn
+    over, so a paused or settled world costs next to nothing. The whole frame is
+    drawn when there is no earlier one. With tiny tiles the ArrayRenderer
+    redraws the whole grid whenever any cell changed, which is cheaper than
+    finding the tiles. Also publishes the meters, if any.
+    """
+    global displayed, hud_rect
+    cells = world.life.tobytes()
+    if meters:
+        meters.tick(cells)
+    if displayed is None or len(displayed) != len(cells) or layer_outdated(world):
+        screen.fill((0, 0, 0))
+        draw_everything(world, cycle, instructions)
+        return [screen.get_rect()]
+
+    width = world.width
+    dirty = []
+    if cells != displayed and array_mode():
+        dirty.append(renderer.draw(screen))
+    elif cells != displayed:
+        # Runs of changed cells are the nonzero runs of the XOR of both grids
+        for run in CHANGES.finditer(xor_bytes(displayed, cells)):
+            start, end = run.span()
+            while start < end:
+                row, col = divmod(start, width)
+                stop = min(end, start - col + width)
+                dirty.append(draw_tiles(cells, width, row, col, col + stop - start))
+                start = stop
+    displayed = cells
+
+    if not update_hud(world, cycle, instructions) and hud_rect.collidelist(dirty) == -1:
+        return dirty
+
+    # The HUD is drawn over the grid: restore what it covered, then draw it again
+    dirty.append(hud_rect)
+    screen.fill((0, 0, 0), hud_rect)
+    if array_mode():
+        renderer.restore(screen, hud_rect)
+    else:
+        first_col = hud_rect.left // TILE_SIZE
+        last_col = min(width, -(-hud_rect.right // TILE_SIZE))
+        rows = range(hud_rect.top // TILE_SIZE, min(world.height, -(-hud_rect.bottom // TILE_SIZE)))
+        for row in rows if first_col < last_col else ():
+            draw_tiles(cells, width, row, first_col, last_col)
+    hud_rect = hud.draw(screen)
+    dirty.append(hud_rect)
+    return dirty
+
+
+async def run(args, rule_table, world, engine, stats=None):
+    """Open the game window on a world and run the simulation until it is closed.
+
+    engine steps the world and is closed at the end; stats is a
+    zone_stats.ZoneStats the engine feeds every generation, if any.
+    With --record every displayed generation is recorded until R replaces the world.
+    With --rewind the last generations and edits are kept in a rewind.History
+    that LEFT and RIGHT step back and forward through without stepping.
+    """
+    global TILE_SIZE, paused, screen, hud, meters
+    # Screen settings
+    TILE_SIZE = args.tilesize
+    GRID_WIDTH = world.width
+    GRID_HEIGHT = world.height
+    if args.load:
+        # The window fits the loaded world
+        WIDTH = GRID_WIDTH * TILE_SIZE
+        HEIGHT = GRID_HEIGHT * TILE_SIZE
+    else:
+        WIDTH = args.width
+        HEIGHT = args.height
+
+    # Game of Life settings
+    SIMULATION_SPEED = args.delay  # Frames between updates
+    simulation_counter = 0
+    paused = True  # Start paused
+    try:
+        pygame.init()
+        load_sprites()
+        hud = Hud()
+        meters = Meters()
+
+        detector = CycleDetector(world, rule_table, args.cycle_history) \
+            if args.detect_cycles else None
+        recorder = Recorder(world, args.record, args.keyframe_interval) if args.record else None
+        history = History(world, args.rewind, args.rewind_memory * 1024 * 1024) \
+            if args.rewind else None
+
+        # Pygame setup
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Goblin vs Mage Game of Life")
+        clock = pygame.time.Clock()
+        running = True
+
+        # Main game loop
+        while running:
+            # Process events
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        # Toggle pause
+                        paused = not paused
+                    elif event.key == pygame.K_r:
+                        # Regenerate terrain and reset
+                        close_engine(engine)
+                        if recorder:
+                            # A recording holds a single world
+                            recorder.close()
+                            recorder = None
+                            print(f"Recording written to {args.record}")
+                        world = create_world(GRID_WIDTH, GRID_HEIGHT, next_seed(world.seed))
+                        reset_background()
+                        engine = create_engine(args.engine, world, rule_table, args.workers, stats)
+                        if detector:
+                            detector = CycleDetector(world, rule_table, args.cycle_history)
+                        if history:
+                            history = History(world, history.generations, history.memory)
+                    elif event.key == pygame.K_c:
+                        # Clear life grid
+                        world.clear_life()
+                        if engine:
+                            engine.sync()
+                        if detector:
+                            detector.reset()
+                        if history:
+                            history.record()
+                    elif event.key == pygame.K_g:
+                        # Add random goblins
+                        add_random_entities(world, GOBLIN)
+                        if engine:
+                            engine.sync()
+                        if detector:
+                            detector.reset()
+                        if history:
+                            history.record()
+                    elif event.key == pygame.K_m:
+                        # Add random mages
+                        add_random_entities(world, MAGE)
+                        if engine:
+                            engine.sync()
+                        if detector:
+                            detector.reset()
+                        if history:
+                            history.record()
+                    elif event.key == pygame.K_f:
+                        # Fast-forward without drawing the generations in between
+                        far = event.mod & pygame.KMOD_SHIFT
+                        generations = FAST_FORWARD_FAR if far else FAST_FORWARD
+                        start = time.perf_counter()
+                        if detector and detector.cycle:
+                            # The world repeats itself, skip ahead without stepping
+                            detector.jump(engine, world.generation + generations)
+                        else:
+                            advance_generation(world, engine, generations)
+                        meters.stepped(generations, time.perf_counter() - start)
+                        if recorder:
+                            recorder.record()
+                        if history:
+                            history.record()
+                    elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and history:
+                        # Step through the history; the engine only needs to pick up the state
+                        moved = history.back() if event.key == pygame.K_LEFT else history.forward()
+                        if moved:
+                            paused = True
+                            if engine:
+                                engine.sync()
+                            if detector:
+                                detector.reset()
+
+                # Mouse interaction to add entities
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    mouse_x, mouse_y = pygame.mouse.get_pos()
+                    grid_x, grid_y = mouse_x // TILE_SIZE, mouse_y // TILE_SIZE
+
+                    # Left click adds goblin, right click adds mage
+                    entity = {1: GOBLIN, 3: MAGE}.get(event.button, EMPTY)
+                    if entity != EMPTY and 0 <= grid_x < world.width and 0 <= grid_y < world.height:
+                        index = world.index(grid_y, grid_x)
+                        if not world.blocked[index]:
+                            world.life[index] = entity
+                            if engine:
+                                engine.cell_changed(grid_y, grid_x)
+                            if detector:
+                                detector.reset()
+                            if history:
+                                history.record()
+
+            # Update simulation
+            if not paused:
+                simulation_counter += 1
+                if simulation_counter >= SIMULATION_SPEED:
+                    start = time.perf_counter()
+                    if detector and detector.cycle and detector.cycle.period == 1:
+                        # Nothing changes any more, only the generation number moves on
+                        detector.jump(engine, world.generation + 1)
+                    else:
+                        advance_generation(world, engine)
+                        if detector:
+                            searching = detector.cycle is None
+                            if detector.observe() and searching:
+                                # Pause once when the battle settles
+                                paused = True
+                    meters.stepped(1, time.perf_counter() - start)
+                    if recorder:
+                        recorder.record()
+                    if history:
+                        history.record()
+                    simulation_counter = 0
+
+            # Draw what changed
+            start = time.perf_counter()
+            pygame.display.update(draw_frame(world, detector.cycle if detector else None))
+            meters.drawn(time.perf_counter() - start)
+            clock.tick(60)
+    finally:
+        close_engine(engine)
+    if recorder:
+        recorder.close()
+        print(f"Recording written to {args.record}")
+    if args.save_on_exit:
+        import snapshot
+        snapshot.save(world, args.save_on_exit)
+    pygame.quit()
+
+
+async def replay(args, player):
+    """Open a window playing back a recording from generation args.seek on.
+
+    The meters count decoding a generation as stepping it.
+    """
+    global TILE_SIZE, paused, screen, hud, meters
+    TILE_SIZE = args.tilesize
+    world = player.seek(args.seek)
+    SIMULATION_SPEED = args.delay  # Frames between generations
+    simulation_counter = 0
+    paused = True
+    pygame.init()
+    load_sprites()
+    hud = Hud()
+    meters = Meters()
+
+    screen = pygame.display.set_mode((world.width * TILE_SIZE, world.height * TILE_SIZE))
+    pygame.display.set_caption(f"Goblin vs Mage Game of Life - {os.path.basename(args.replay)}")
+    clock = pygame.time.Clock()
+    running = True
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                # Recorded generations need not be consecutive, step to the neighbouring record
+                position = player.position
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    player.seek(player.generations[min(position + 1, len(player.generations) - 1)])
+                elif event.key == pygame.K_LEFT:
+                    player.seek(player.generations[max(position - 1, 0)])
+                elif event.key == pygame.K_UP:
+                    player.seek(world.generation + FAST_FORWARD)
+                elif event.key == pygame.K_DOWN:
+                    player.seek(world.generation - FAST_FORWARD)
+                elif event.key == pygame.K_HOME:
+                    player.seek(player.first)
+                elif event.key == pygame.K_END:
+                    player.seek(player.last)
+
+        if not paused:
+            simulation_counter += 1
+            if simulation_counter >= SIMULATION_SPEED:
+                if player.position + 1 < len(player.generations):
+                    start = time.perf_counter()
+                    generation = world.generation
+                    player.seek(player.generations[player.position + 1])
+                    meters.stepped(world.generation - generation, time.perf_counter() - start)
+                else:
+                    # Stop at the end of the recording
+                    paused = True
+                simulation_counter = 0
+
+        start = time.perf_counter()
+        pygame.display.update(draw_frame(world, instructions=REPLAY_INSTRUCTIONS))
+        meters.drawn(time.perf_counter() - start)
+        clock.tick(60)
+
+    if args.save_on_exit:
+        import snapshot
+        snapshot.save(world, args.save_on_exit)
+    pygame.quit()
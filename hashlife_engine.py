@@ -0,0 +1,257 @@
+"""Memoized quadtree (hashlife) engine for long runs on static terrain.
+
+The map is a quadtree of hash-consed nodes. A leaf holds a cell's terrain and
+life state together (or VOID for buildings and the area around the map), so
+every identical (terrain, life) square anywhere on the map is the same node.
+A node of size 2^k remembers its center advanced 2^j generations for every j
+it was asked for, and repetitive regions are advanced in exponentially large
+steps by reusing those results.
+
+Flower land births pick their faction from their position and generation, so
+a result that involved one is only valid where and when it was computed: it
+is recomputed every time instead of cached. The node table is bounded; when
+it fills up it is dropped and the tree is rebuilt from the world.
+"""
+from lookup_engine import NEIGHBOR_WEIGHTS, CELL_STRIDE
+from counter_rng import spawn_faction
+from rules import EMPTY, SPAWN_RANDOM, CELL_STATES, TERRAIN_NAMES, compile_rule_table
+
+# Leaves are terrain * CELL_STATES + life, or VOID for cells that never hold life
+VOID = len(TERRAIN_NAMES) * CELL_STATES
+LEAF_LIFE = [leaf % CELL_STATES for leaf in range(VOID)] + [EMPTY]
+LEAF_WEIGHTS = [NEIGHBOR_WEIGHTS[life] for life in LEAF_LIFE]
+
+# Nodes kept before the table is dropped and rebuilt
+DEFAULT_MAX_NODES = 1 << 20
+
+# Neighbor offsets and the center cells of a 4x4 node
+NEIGHBORS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+CENTER = [(1, 1), (1, 2), (2, 1), (2, 2)]
+
+
+class Node:
+    """A 2^level square of the map made of four quadrant nodes (or leaves at level 1)."""
+
+    __slots__ = ("level", "nw", "ne", "sw", "se", "population", "results")
+
+    def __init__(self, level, nw, ne, sw, se, population):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        # Live cells in the square
+        self.population = population
+        # Center advanced 2^j generations, by j
+        self.results = {}
+
+
+class HashlifeEngine:
+    """Steps a world with a memoized quadtree, 2^j generations at a time."""
+
+    def __init__(self, world, rule_table=None, max_nodes=DEFAULT_MAX_NODES):
+        self.world = world
+        self.table = rule_table or compile_rule_table()
+        self.max_nodes = max_nodes
+        self.sync()
+
+    def join(self, nw, ne, sw, se):
+        """The unique node with the given quadrants."""
+        key = (nw, ne, sw, se)
+        node = self.nodes.get(key)
+        if node is None:
+            if isinstance(nw, int):
+                node = Node(1, nw, ne, sw, se, sum(1 for leaf in key if LEAF_LIFE[leaf]))
+            else:
+                node = Node(nw.level + 1, nw, ne, sw, se,
+                            nw.population + ne.population + sw.population + se.population)
+            self.nodes[key] = node
+        return node
+
+    def void(self, level):
+        """The node of the given level without any cell that can hold life."""
+        while len(self.voids) <= level:
+            child = self.voids[-1]
+            self.voids.append(self.join(child, child, child, child))
+        return self.voids[level]
+
+    def leaf(self, row, col):
+        """Leaf of a map cell; everything off the map is void."""
+        world = self.world
+        if not (0 <= row < world.height and 0 <= col < world.width):
+            return VOID
+        index = world.index(row, col)
+        if world.blocked[index]:
+            return VOID
+        return world.terrain[index] * CELL_STATES + world.life[index]
+
+    def build(self, level, row, col):
+        """Node for the 2^level square of the map with its top-left corner at (row, col)."""
+        world = self.world
+        size = 1 << level
+        if row >= world.height or col >= world.width or row + size <= 0 or col + size <= 0:
+            return self.void(level)
+        if level == 1:
+            return self.join(self.leaf(row, col), self.leaf(row, col + 1),
+                             self.leaf(row + 1, col), self.leaf(row + 1, col + 1))
+        half = size // 2
+        return self.join(self.build(level - 1, row, col), self.build(level - 1, row, col + half),
+                         self.build(level - 1, row + half, col),
+                         self.build(level - 1, row + half, col + half))
+
+    def sync(self):
+        """Rebuild the tree (and drop every cached result) from the world."""
+        world = self.world
+        self.nodes = {}
+        self.voids = [VOID]
+        # The map sits in the top-left of the root's center square, so a root
+        # of level L can be advanced 2^(L-2) generations without losing cells
+        self.level = max(3, (max(world.width, world.height) - 1).bit_length() + 1)
+        self.origin = -(1 << (self.level - 2))
+        self.root = self.build(self.level, self.origin, self.origin)
+
+    def set_leaf(self, node, level, row, col, leaf):
+        """Copy of a node with the cell at (row, col) inside it replaced."""
+        if level == 0:
+            return leaf
+        half = 1 << (level - 1)
+        quadrants = [node.nw, node.ne, node.sw, node.se]
+        quadrant = (row >= half) * 2 + (col >= half)
+        quadrants[quadrant] = self.set_leaf(quadrants[quadrant], level - 1,
+                                            row % half, col % half, leaf)
+        return self.join(*quadrants)
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell, e.g. after a mouse click."""
+        self.root = self.set_leaf(self.root, self.level, row - self.origin,
+                                  col - self.origin, self.leaf(row, col))
+
+    def centered(self, node):
+        """The center half of a node, without advancing it."""
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def advance_base(self, node, row, col, generation):
+        """Center 2x2 of a 4x4 node after one generation, and whether it needed randomness."""
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        cells = [[nw.nw, nw.ne, ne.nw, ne.ne],
+                 [nw.sw, nw.se, ne.sw, ne.se],
+                 [sw.nw, sw.ne, se.nw, se.ne],
+                 [sw.sw, sw.se, se.sw, se.se]]
+        table = self.table
+        used_random = False
+        center = []
+        for y, x in CENTER:
+            leaf = cells[y][x]
+            if leaf == VOID:
+                center.append(VOID)
+                continue
+            packed = sum(LEAF_WEIGHTS[cells[y + dy][x + dx]] for dy, dx in NEIGHBORS)
+            new_cell = table[leaf * CELL_STRIDE + packed]
+            if new_cell == SPAWN_RANDOM:
+                new_cell = spawn_faction(self.world.seed, generation, row + y, col + x)
+                used_random = True
+            center.append(leaf - LEAF_LIFE[leaf] + new_cell)
+        return self.join(*center), used_random
+
+    def advance(self, node, j, row, col, generation):
+        """Center half of a node (top-left at (row, col)) advanced 2^j generations.
+
+        Returns the result node and whether a random birth was involved, in which
+        case the result is not cached. j is at most node.level - 2.
+        """
+        result = node.results.get(j)
+        if result is not None:
+            return result, False
+        if node.level == 2:
+            result, used_random = self.advance_base(node, row, col, generation)
+            if not used_random:
+                node.results[j] = result
+            return result, used_random
+
+        # Nine overlapping subsquares of half the size, eighth of the size apart
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        subsquares = [
+            [nw, self.join(nw.ne, ne.nw, nw.se, ne.sw), ne],
+            [self.join(nw.sw, nw.se, sw.nw, sw.ne), self.centered(node),
+             self.join(ne.sw, ne.se, se.nw, se.ne)],
+            [sw, self.join(sw.ne, se.nw, sw.se, se.sw), se]
+        ]
+        quarter = 1 << (node.level - 2)
+        eighth = quarter // 2
+        used_random = False
+        full_step = j == node.level - 2
+        if full_step:
+            # Advance the subsquares the first half of the way
+            half_j = j - 1
+            parts = []
+            for y, line in enumerate(subsquares):
+                parts.append([])
+                for x, subsquare in enumerate(line):
+                    part, random_part = self.advance(subsquare, half_j, row + y * quarter,
+                                                     col + x * quarter, generation)
+                    parts[-1].append(part)
+                    used_random |= random_part
+            generation += 1 << half_j
+        else:
+            half_j = j
+            parts = [[self.centered(subsquare) for subsquare in line] for line in subsquares]
+
+        # Four quadrant-sized squares around the center, advanced the (rest of the) way
+        quadrants = []
+        for y in (0, 1):
+            for x in (0, 1):
+                square = self.join(parts[y][x], parts[y][x + 1],
+                                   parts[y + 1][x], parts[y + 1][x + 1])
+                quadrant, random_quadrant = self.advance(
+                    square, half_j, row + eighth + y * quarter, col + eighth + x * quarter,
+                    generation)
+                quadrants.append(quadrant)
+                used_random |= random_quadrant
+
+        result = self.join(*quadrants)
+        if not used_random:
+            node.results[j] = result
+        return result, used_random
+
+    def pad(self, node):
+        """Node twice the size with the given one in its center and void around it."""
+        void = self.void(node.level - 1)
+        return self.join(self.join(void, void, void, node.nw), self.join(void, void, node.ne, void),
+                         self.join(void, node.sw, void, void), self.join(node.se, void, void, void))
+
+    def step(self, generations=1):
+        """Advance the world the given number of generations, in power of two jumps."""
+        world = self.world
+        while generations > 0:
+            j = generations.bit_length() - 1
+            while self.level < j + 2:
+                self.root = self.pad(self.root)
+                self.origin -= 1 << (self.level - 1)
+                self.level += 1
+            result, _ = self.advance(self.root, j, self.origin, self.origin, world.generation)
+            self.root = self.pad(result)
+            world.generation += 1 << j
+            generations -= 1 << j
+        self.write_world()
+        if len(self.nodes) > self.max_nodes:
+            self.sync()
+
+    def write_world(self):
+        """Copy the live cells of the tree into world.life."""
+        self.world.clear_life()
+        self.write_node(self.root, self.level, self.origin, self.origin)
+
+    def write_node(self, node, level, row, col):
+        """Copy the live cells of a node with its top-left corner at (row, col)."""
+        if level == 0:
+            # Only cells on the map can hold life
+            if LEAF_LIFE[node]:
+                self.world.life[self.world.index(row, col)] = LEAF_LIFE[node]
+            return
+        if node.population == 0:
+            return
+        half = 1 << (level - 1)
+        self.write_node(node.nw, level - 1, row, col)
+        self.write_node(node.ne, level - 1, row, col + half)
+        self.write_node(node.sw, level - 1, row + half, col)
+        self.write_node(node.se, level - 1, row + half, col + half)
@@ -0,0 +1,100 @@
+"""Heads-up display of the game window: status, live meters and key help.
+
+The font is loaded once and every line keeps its rendered surface until its
+text changes. The meters only publish new averages every METER_INTERVAL
+seconds, so most frames render no text at all and, with draw_frame(), leave
+the HUD alone.
+"""
+import time
+
+import pygame
+
+from rules import GOBLIN, MAGE
+
+FONT_NAME = "Arial"
+FONT_SIZE = 24
+TEXT_COLOR = (255, 255, 255)
+# Top left corner of the first line and distance between lines
+ORIGIN = (10, 10)
+LINE_SPACING = 30
+# Seconds the meters average over before showing new values
+METER_INTERVAL = 0.5
+
+
+class Meters:
+    """Frame rate, generations per second and step and draw times, averaged per interval."""
+
+    def __init__(self, interval=METER_INTERVAL):
+        self.interval = interval
+        self.start = time.perf_counter()
+        # Sums over the current interval
+        self.frames = self.generations = self.steps = 0
+        self.step_time = self.draw_time = 0.0
+        # Averages of the last interval, and the populations at its end
+        self.fps = self.generation_rate = self.step_ms = self.draw_ms = 0.0
+        self.goblins = self.mages = 0
+
+    def stepped(self, generations, seconds):
+        """Count a step of the engine over some generations."""
+        self.steps += 1
+        self.generations += generations
+        self.step_time += seconds
+
+    def drawn(self, seconds):
+        """Count a drawn frame."""
+        self.frames += 1
+        self.draw_time += seconds
+
+    def tick(self, cells):
+        """Publish the averages once the interval is over; cells are the life grid's bytes."""
+        now = time.perf_counter()
+        elapsed = now - self.start
+        if elapsed < self.interval:
+            return
+        self.fps = self.frames / elapsed
+        self.generation_rate = self.generations / elapsed
+        self.step_ms = self.step_time / self.steps * 1000 if self.steps else 0.0
+        self.draw_ms = self.draw_time / self.frames * 1000 if self.frames else 0.0
+        self.goblins = cells.count(GOBLIN)
+        self.mages = cells.count(MAGE)
+        self.start = now
+        self.frames = self.generations = self.steps = 0
+        self.step_time = self.draw_time = 0.0
+
+    def lines(self):
+        """HUD lines showing the meters."""
+        return [f"{self.fps:.0f} FPS - {self.generation_rate:.1f} generations/s - "
+                f"step {self.step_ms:.2f} ms - draw {self.draw_ms:.2f} ms",
+                f"goblins {self.goblins} - mages {self.mages}"]
+
+
+class Hud:
+    """Lines of text drawn over the grid, rendered again only when they change."""
+
+    def __init__(self):
+        self.font = pygame.font.SysFont(FONT_NAME, FONT_SIZE)
+        # (text, rendered surface) of every line
+        self.lines = []
+
+    def update(self, texts):
+        """Set the text of every line; returns whether any of them changed."""
+        changed = len(texts) != len(self.lines)
+        del self.lines[len(texts):]
+        for number, text in enumerate(texts):
+            if number < len(self.lines) and self.lines[number][0] == text:
+                continue
+            line = (text, self.font.render(text, True, TEXT_COLOR))
+            if number < len(self.lines):
+                self.lines[number] = line
+            else:
+                self.lines.append(line)
+            changed = True
+        return changed
+
+    def draw(self, screen):
+        """Blit every line; returns the rect they cover."""
+        x, y = ORIGIN
+        rect = pygame.Rect(x, y, 0, 0)
+        for number, (_, surface) in enumerate(self.lines):
+            rect.union_ip(screen.blit(surface, (x, y + number * LINE_SPACING)))
+        return rect
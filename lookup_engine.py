@@ -0,0 +1,127 @@
+"""Pure-Python stepping engine driven by the compiled rule table.
+
+Cells are kept in a flat list with a one-cell empty border, so neighbor
+counts can be scattered from live cells without bounds checks and each cell's
+next state is a single rule table lookup.
+"""
+from array import array
+
+from counter_rng import spawn_faction
+from rules import (EMPTY, SPAWN_RANDOM,
+                   CELL_STATES, NEIGHBOR_STATES, compile_rule_table)
+from zone_stats import TRANSITIONS
+
+# Goblin and mage neighbor counts are packed into one number,
+# goblin_count * 9 + mage_count, which is the low part of a rule table index
+NEIGHBOR_WEIGHTS = [0, NEIGHBOR_STATES, 1]
+CELL_STRIDE = NEIGHBOR_STATES * NEIGHBOR_STATES
+TERRAIN_STRIDE = CELL_STATES * CELL_STRIDE
+
+
+class LookupEngine:
+    """Steps a world with one rule table lookup per cell."""
+
+    def __init__(self, world, rule_table=None, stats=None):
+        self.world = world
+        # zone_stats.ZoneStats fed every generation, if any
+        self.stats = stats
+        self.height = world.height
+        self.width = world.width
+        self.stride = self.width + 2
+        self.table = rule_table or compile_rule_table()
+
+        size = self.stride * (self.height + 2)
+        self.life = [EMPTY] * size
+        # Buffers reused by every advance(): the neighbor counts, cleared
+        # from no_counts, and the next generation, swapped with self.life
+        self.counts = [0] * size
+        self.no_counts = [0] * size
+        self.next_life = [EMPTY] * size
+        self.terrain_base = [0] * size
+        for row in range(self.height):
+            for col in range(self.width):
+                self.terrain_base[self.index(row, col)] = \
+                    world.terrain[world.index(row, col)] * TERRAIN_STRIDE
+
+        # Border and building cells are always empty
+        interior = {self.index(row, col) for row in range(self.height)
+                    for col in range(self.width)}
+        self.void = [p for p in range(size) if p not in interior]
+        self.void.extend(self.index(row, col) for row in range(self.height)
+                         for col in range(self.width) if world.blocked[world.index(row, col)])
+        void = set(self.void)
+        self.open = [p for p in sorted(interior) if p not in void]
+
+        s = self.stride
+        self.offsets = (-s - 1, -s, -s + 1, -1, 1, s - 1, s, s + 1)
+        self.sync()
+
+    def index(self, row, col):
+        """Position of a grid cell in the padded flat arrays."""
+        return (row + 1) * self.stride + col + 1
+
+    def sync(self):
+        """Pick up edits made directly to world.life."""
+        for row in range(self.height):
+            start = self.index(row, 0)
+            self.life[start:start + self.width] = self.world.life[row * self.width:
+                                                                  (row + 1) * self.width]
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell, e.g. after a mouse click."""
+        self.life[self.index(row, col)] = self.world.life[self.world.index(row, col)]
+
+    def step(self, generations=1):
+        """Advance the world the given number of generations."""
+        for _ in range(generations):
+            self.advance()
+            self.world.generation += 1
+        self.write_world()
+
+    def advance(self):
+        """Compute the next generation in the padded list, without touching world.life."""
+        life = self.life
+        counts = self.counts
+        counts[:] = self.no_counts
+        for p, cell in enumerate(life):
+            if cell:
+                weight = NEIGHBOR_WEIGHTS[cell]
+                for offset in self.offsets:
+                    counts[p + offset] += weight
+
+        table = self.table
+        new_life = self.next_life
+        p = 0
+        for base, cell, packed in zip(self.terrain_base, life, counts):
+            new_life[p] = table[base + cell * CELL_STRIDE + packed]
+            p += 1
+
+        for p in self.void:
+            new_life[p] = EMPTY
+
+        # Peaceful births pick their faction at random
+        world = self.world
+        p = -1
+        for _ in range(new_life.count(SPAWN_RANDOM)):
+            p = new_life.index(SPAWN_RANDOM, p + 1)
+            row, col = divmod(p, self.stride)
+            new_life[p] = spawn_faction(world.seed, world.generation, row - 1, col - 1)
+
+        if self.stats:
+            terrain_base = self.terrain_base
+            histogram = [0] * TRANSITIONS
+            for p in self.open:
+                histogram[(terrain_base[p] + life[p] * CELL_STRIDE + counts[p]) * CELL_STATES
+                          + new_life[p]] += 1
+            transitions = [transition for transition, count in enumerate(histogram) if count]
+            self.stats.add(world.seed, world.generation + 1, transitions,
+                           [histogram[transition] for transition in transitions])
+
+        self.life, self.next_life = new_life, life
+
+    def write_world(self):
+        """Copy the current generation into world.life."""
+        for row in range(self.height):
+            start = self.index(row, 0)
+            self.world.life[row * self.width:(row + 1) * self.width] = \
+                array("b", self.life[start:start + self.width])
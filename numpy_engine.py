@@ -0,0 +1,198 @@
+"""Vectorized stepping engine for the Goblin vs Mage game of life.
+
+Terrain and life cells are viewed as small integer NumPy arrays and the
+next state of the whole grid is gathered from the compiled rule table at once,
+instead of walking the grid cell by cell like update_life_grid() does.
+"""
+import numpy as np
+
+from counter_rng import (INITIAL_LIFE, INITIAL_NEUTRAL_LIFE, INITIAL_FACTION, SPAWN,
+                         GOLDEN_GAMMA, MIX_MULTIPLIERS, MIX_SHIFTS, key_prefix)
+from rules import (EMPTY, GOBLIN, MAGE, SPAWN_RANDOM, TERRAIN_CODES,
+                   CELL_STATES, NEIGHBOR_STATES, compile_rule_table)
+from zone_stats import TRANSITIONS
+
+
+def terrain_array(world):
+    """View a world's terrain codes as a (height, width) uint8 array without copying."""
+    return np.frombuffer(world.terrain, dtype=np.uint8).reshape(world.height, world.width)
+
+
+def life_array(world):
+    """View a world's life cells as a (height, width) int8 array without copying."""
+    return np.frombuffer(world.life, dtype=np.int8).reshape(world.height, world.width)
+
+
+def blocked_array(world):
+    """View a world's building occupancy mask as a (height, width) bool array without copying."""
+    return np.frombuffer(world.blocked, dtype=np.bool_).reshape(world.height, world.width)
+
+
+def mix(values):
+    """counter_rng.mix() on a uint64 array (multiplication wraps modulo 2**64)."""
+    values = (values ^ values >> np.uint64(MIX_SHIFTS[0])) * np.uint64(MIX_MULTIPLIERS[0])
+    values = (values ^ values >> np.uint64(MIX_SHIFTS[1])) * np.uint64(MIX_MULTIPLIERS[1])
+    return values ^ values >> np.uint64(MIX_SHIFTS[2])
+
+
+def combine(bits, values):
+    """counter_rng.combine() on uint64 arrays (values may be any integer array or scalar)."""
+    return mix((bits ^ np.asarray(values).astype(np.uint64)) + np.uint64(GOLDEN_GAMMA))
+
+
+def keyed_spawn_factions(prefixes, rows, cols):
+    """Factions of births at arrays of cell positions, given the SPAWN key_prefix() of each."""
+    bits = combine(combine(prefixes, rows), cols)
+    return np.where(bits >> np.uint64(63), MAGE, GOBLIN).astype(np.int8)
+
+
+def spawn_factions(seed, generation, rows, cols):
+    """counter_rng.spawn_faction() for arrays of cell positions."""
+    prefixes = np.full(rows.shape, key_prefix(seed, generation, SPAWN), dtype=np.uint64)
+    return keyed_spawn_factions(prefixes, rows, cols)
+
+
+def random_floats(seed, generation, rows, cols, purpose):
+    """counter_rng.random_float() for arrays of cell positions."""
+    bits = combine(combine(np.uint64(key_prefix(seed, generation, purpose)), rows), cols)
+    return (bits >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def initial_cells(seed, generation, rows, cols, terrain, base_density, neutral_density):
+    """world.initial_cell() for a block of cells; rows and cols broadcast to terrain's shape."""
+    rows, cols = np.broadcast_arrays(rows, cols)
+    cells = np.zeros(terrain.shape, dtype=np.int8)
+    # Sparser population in neutral territories; only its few births draw a faction
+    born = random_floats(seed, generation, rows, cols, INITIAL_NEUTRAL_LIFE) < neutral_density
+    goblin = random_floats(seed, generation, rows[born], cols[born], INITIAL_FACTION) < 0.5
+    cells[born] = np.where(goblin, GOBLIN, MAGE)
+    # Higher odds near their respective zones, which take precedence
+    goblin_zone = terrain == TERRAIN_CODES["brown_grass"]
+    zone = goblin_zone | (terrain == TERRAIN_CODES["flower_land"])
+    born = random_floats(seed, generation, rows[zone], cols[zone], INITIAL_LIFE) < base_density
+    cells[zone] = np.where(born, np.where(goblin_zone[zone], GOBLIN, MAGE), cells[zone])
+    return cells
+
+
+class Stepper:
+    """Steps a grid with fixed terrain into preallocated buffers, allocating nothing per generation.
+
+    The neighbor count planes, rule table indices and spawn mask are created
+    once and every NumPy operation writes into them with out=, so the only
+    memory a generation needs is NumPy's fixed-size casting buffers and the
+    positions of flower land births. Conflicts need no scratch space of their
+    own, the rule table already resolves them.
+
+    The grids may be stacked along leading batch axes for lookup(), e.g. by
+    batch_engine.BatchEngine; step() takes a single grid.
+    """
+
+    def __init__(self, terrain, blocked, rule_table):
+        height, width = terrain.shape[-2:]
+        self.blocked = blocked
+        self.rule_table = rule_table
+        self.weights = np.array([0, NEIGHBOR_STATES, 1], dtype=np.int16)
+        self.weighted = np.zeros(terrain.shape, dtype=np.int16)
+        self.padded = np.zeros(terrain.shape[:-2] + (height + 2, width + 2), dtype=np.int16)
+        self.interior = self.padded[..., 1:-1, 1:-1]
+        # Views of the eight neighbors of every cell, made once
+        self.shifted = [self.padded[..., dy:dy + height, dx:dx + width]
+                        for dy in range(3) for dx in range(3) if dy != 1 or dx != 1]
+        self.counts = np.zeros(terrain.shape, dtype=np.int16)
+        self.terrain_base = terrain.astype(np.intp) * (CELL_STATES * NEIGHBOR_STATES ** 2)
+        self.index = np.zeros(terrain.shape, dtype=np.intp)
+        self.spawn = np.zeros(terrain.shape, dtype=np.bool_)
+
+    def lookup(self, life, out):
+        """Write the rule table entry of every cell of life to out (a different array).
+
+        Peaceful births are left as SPAWN_RANDOM and buildings are not cleared.
+        """
+        # Lookups need intp indices; converting into the index buffer keeps
+        # take() from making its own copy. The ndarray method is called
+        # directly: the np.take() wrapper keeps a few small blocks alive in
+        # its first few dozen calls
+        np.copyto(self.index, life)
+        self.weights.take(self.index, out=self.weighted, mode="clip")
+        np.copyto(self.interior, self.weighted)
+        np.add(self.shifted[0], self.shifted[1], out=self.counts)
+        for shifted in self.shifted[2:]:
+            np.add(self.counts, shifted, out=self.counts)
+
+        np.multiply(self.index, NEIGHBOR_STATES * NEIGHBOR_STATES, out=self.index)
+        np.add(self.index, self.terrain_base, out=self.index)
+        np.add(self.index, self.counts, out=self.index)
+        self.rule_table.take(self.index, out=out, mode="clip")
+        return out
+
+    def step(self, life, out, seed, generation, first_row=0):
+        """Write the generation after life to out (a different array of the same shape).
+
+        first_row is the grid row of life[0] when stepping a band of a larger
+        grid, so random spawns are decided by their position in the whole grid.
+        """
+        self.lookup(life, out)
+
+        # Peaceful births pick their faction at random
+        np.equal(out, SPAWN_RANDOM, out=self.spawn)
+        if self.spawn.any():
+            rows, cols = np.nonzero(self.spawn)
+            out[rows, cols] = spawn_factions(seed, generation, rows + first_row, cols)
+
+        # Buildings never hold life
+        np.copyto(out, EMPTY, where=self.blocked)
+        return out
+
+    def transitions(self, out):
+        """Histogram of the open cells by rule table index and next state (see zone_stats).
+
+        Must follow step(), with the array it wrote to; reuses the index buffer.
+        """
+        np.multiply(self.index, CELL_STATES, out=self.index)
+        np.add(self.index, out, out=self.index)
+        # Buildings go to an extra bin that is cut off
+        np.copyto(self.index, TRANSITIONS, where=self.blocked)
+        return np.bincount(self.index.ravel(), minlength=TRANSITIONS + 1)[:TRANSITIONS]
+
+
+class NumpyEngine:
+    """Steps the whole life grid of a world at once through NumPy views of its arrays.
+
+    Generations are stepped ping-pong between world.life and a second buffer
+    with a Stepper, so the steady state allocates no arrays.
+    """
+
+    def __init__(self, world, rule_table=None, stats=None):
+        self.world = world
+        # zone_stats.ZoneStats fed every generation, if any
+        self.stats = stats
+        self.terrain = terrain_array(world)
+        self.blocked = blocked_array(world)
+        self.life = life_array(world)
+        self.rule_table = np.frombuffer(
+            rule_table or compile_rule_table(), dtype=np.int8)
+        self.stepper = Stepper(self.terrain, self.blocked, self.rule_table)
+        # Second buffer, so several generations can be stepped ping-pong
+        self.spare = np.empty_like(self.life)
+
+    def sync(self):
+        """Pick up edits to world.life (nothing to do, the engine works on a view of it)."""
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell (nothing to do, see sync)."""
+
+    def step(self, generations=1):
+        """Advance the world the given number of generations."""
+        world = self.world
+        current, spare = self.life, self.spare
+        for _ in range(generations):
+            self.stepper.step(current, spare, world.seed, world.generation)
+            if self.stats:
+                histogram = self.stepper.transitions(spare)
+                transitions = np.flatnonzero(histogram)
+                self.stats.add(world.seed, world.generation + 1, transitions.tolist(),
+                               histogram[transitions].tolist())
+            current, spare = spare, current
+            world.generation += 1
+        if current is not self.life:
+            np.copyto(self.life, current)
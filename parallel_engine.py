@@ -0,0 +1,187 @@
+"""Multi-process stepping engine over shared memory.
+
+The grid is split into horizontal bands, one per worker process. Terrain, the
+building mask and two life buffers (current and next generation) live in
+multiprocessing.shared_memory, so a generation is just: every worker reads its
+band plus a one-row halo above and below from the current buffer, steps it
+with a preallocated numpy_engine.Stepper and writes its rows into the next buffer.
+The main process starts a step by releasing every worker's semaphore and
+waits for each of them to report back; nothing is pickled per generation.
+When several generations are stepped at once the workers swap the buffers
+among themselves behind a barrier and the main process only waits for the
+last one. Every wait has a timeout, after which the other side is checked:
+a worker that died makes step() raise instead of hanging, and workers exit
+once the main process is gone.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from numpy_engine import terrain_array, life_array, blocked_array, Stepper
+from rules import compile_rule_table
+
+# Control slots shared with the workers
+CURRENT_BUFFER = 0
+STOP = 1
+GENERATION = 2
+GENERATIONS = 3
+
+# Seconds between liveness checks while waiting for the other processes
+POLL_INTERVAL = 1.0
+# Seconds a worker waits for the others to finish a generation before giving up
+BARRIER_TIMEOUT = 60.0
+# Seconds close() gives the workers to exit before terminating them; after a
+# worker died the others may be stuck on the barrier's lock it held
+JOIN_TIMEOUT = 5.0
+
+
+def _attach(name, shape, dtype):
+    """Attach to a shared memory block and view it as an array."""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker(names, shape, rule_table, rows, seed, control, go, band_done, finished):
+    """Step one band of the grid every time the main process releases go."""
+    terrain_shm, terrain = _attach(names["terrain"], shape, np.uint8)
+    blocked_shm, blocked = _attach(names["blocked"], shape, np.bool_)
+    life_shm, lives = _attach(names["life"], (2,) + shape, np.int8)
+    table = np.frombuffer(rule_table, dtype=np.int8)
+
+    first, last = rows
+    halo_first = max(first - 1, 0)
+    halo_last = min(last + 1, shape[0])
+    stepper = Stepper(terrain[halo_first:halo_last], blocked[halo_first:halo_last], table)
+    band = np.empty((halo_last - halo_first, shape[1]), dtype=np.int8)
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            while not go.acquire(timeout=POLL_INTERVAL):
+                if not parent.is_alive():
+                    return
+            if control[STOP]:
+                break
+
+            current = control[CURRENT_BUFFER]
+            for offset in range(control[GENERATIONS]):
+                if offset:
+                    # Every band must be written before its rows serve as another's halo
+                    try:
+                        band_done.wait(BARRIER_TIMEOUT)
+                    except threading.BrokenBarrierError:
+                        # Another worker died or hangs; the main process reports it
+                        return
+                generation = control[GENERATION] + offset
+                src = lives[current]
+                dst = lives[1 - current]
+                stepper.step(src[halo_first:halo_last], band, seed, generation, halo_first)
+                # Halo rows only provide neighbors, their own result is discarded
+                dst[first:last] = band[first - halo_first:last - halo_first]
+                current = 1 - current
+            finished.release()
+    finally:
+        del stepper, terrain, blocked, lives
+        terrain_shm.close()
+        blocked_shm.close()
+        life_shm.close()
+
+
+class ParallelEngine:
+    """Steps the grid in horizontal bands on a persistent pool of worker processes."""
+
+    def __init__(self, world, rule_table=None, workers=None):
+        self.world = world
+        terrain = terrain_array(world)
+        self.shape = terrain.shape
+        workers = max(1, min(workers or os.cpu_count() or 1, self.shape[0]))
+        rule_table = rule_table or compile_rule_table()
+
+        self._shm = {
+            "terrain": shared_memory.SharedMemory(create=True, size=terrain.nbytes),
+            "blocked": shared_memory.SharedMemory(create=True, size=terrain.size),
+            "life": shared_memory.SharedMemory(create=True, size=2 * terrain.size)
+        }
+        self.terrain = np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm["terrain"].buf)
+        self.terrain[:] = terrain
+        self.blocked = np.ndarray(self.shape, dtype=np.bool_, buffer=self._shm["blocked"].buf)
+        self.blocked[:] = blocked_array(world)
+        self.lives = np.ndarray((2,) + self.shape, dtype=np.int8, buffer=self._shm["life"].buf)
+        self.world_life = life_array(world)
+        self.lives[0] = self.world_life
+
+        context = multiprocessing.get_context()
+        self.control = context.RawArray("q", 4)
+        self.go = [context.Semaphore(0) for _ in range(workers)]
+        self.band_done = context.Barrier(workers)
+        self.finished = context.Semaphore(0)
+
+        names = {key: shm.name for key, shm in self._shm.items()}
+        bands = np.array_split(np.arange(self.shape[0]), workers)
+        self.workers = []
+        for band, go in zip(bands, self.go):
+            process = context.Process(
+                target=_worker, daemon=True,
+                args=(names, self.shape, rule_table, (int(band[0]), int(band[-1]) + 1),
+                      world.seed, self.control, go, self.band_done, self.finished))
+            process.start()
+            self.workers.append(process)
+
+    @property
+    def life(self):
+        """The buffer holding the current generation."""
+        return self.lives[self.control[CURRENT_BUFFER]]
+
+    def sync(self):
+        """Pick up edits made directly to world.life."""
+        self.life[:] = self.world_life
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell, e.g. after a mouse click."""
+        self.life[row, col] = self.world_life[row, col]
+
+    def check_workers(self):
+        """Raise if a worker process has exited."""
+        for number, process in enumerate(self.workers):
+            if not process.is_alive():
+                raise RuntimeError(f"Parallel engine worker {number} exited "
+                                   f"with code {process.exitcode}")
+
+    def step(self, generations=1):
+        """Advance the world the given number of generations on all workers."""
+        if generations < 1:
+            return
+        self.check_workers()
+        self.control[GENERATION] = self.world.generation
+        self.control[GENERATIONS] = generations
+        for go in self.go:
+            go.release()
+        for _ in self.workers:
+            while not self.finished.acquire(timeout=POLL_INTERVAL):
+                self.check_workers()
+        self.control[CURRENT_BUFFER] ^= generations & 1
+        self.world_life[:] = self.life
+        self.world.generation += generations
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        if not self.workers:
+            return
+        self.control[STOP] = 1
+        for go in self.go:
+            go.release()
+        deadline = time.monotonic() + JOIN_TIMEOUT
+        for process in self.workers:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.workers = []
+
+        del self.terrain, self.blocked, self.lives
+        for shm in self._shm.values():
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,288 @@
+"""Delta-encoded recordings of whole battles, with keyframes for random access.
+
+A recording starts with a header and the static part of the world (terrain,
+buildings, seed), followed by one record per recorded generation:
+
+    kind        1 byte   KEYFRAME or DELTA
+    generation  varint
+    length      varint   payload bytes
+    payload
+
+A keyframe holds the whole life grid as runs of (cell, varint run length); a
+delta only the cells that changed since the previous record, as runs of
+(varint gap since the previous run, varint run length, the new cells). Every
+keyframe_interval generations, and whenever the generation does not simply
+move forward, a keyframe is written instead of a delta. Varints are unsigned
+LEB128.
+
+Recorder copies world.life on the simulation thread (a memcpy) and hands it
+to a background thread that diffs, encodes and writes it, so recording costs
+the simulation loop almost nothing. Player maps a file into memory, indexes
+its records and seeks to any generation by decoding the nearest keyframe
+before it and the deltas after it, so only those records are read.
+"""
+import bisect
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+from array import array
+
+from world import NO_POSITION, World, stored_position
+
+MAGIC = b"GVMREC\0\0"
+VERSION = 1
+# magic, version, width, height, seed, keyframe interval, hut x, y, castle x, y
+HEADER = struct.Struct("<8sHIIqI2i2i")
+
+KEYFRAME = 1
+DELTA = 2
+
+DEFAULT_KEYFRAME_INTERVAL = 100
+# Generations waiting for the writer thread before record() blocks
+QUEUE_SIZE = 64
+# A run of equal bytes, and a run of nonzero bytes
+RUNS = re.compile(rb"(.)\1*", re.DOTALL)
+CHANGES = re.compile(rb"[^\0]+")
+
+
+def write_varint(out, value):
+    """Append an unsigned LEB128 varint to a bytearray."""
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    """Decode the varint at position; returns (value, position after it)."""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def encode_runs(cells):
+    """Run-length encode a grid as (cell, varint run length) pairs."""
+    out = bytearray()
+    for run in RUNS.finditer(cells):
+        out.append(cells[run.start()])
+        write_varint(out, run.end() - run.start())
+    return out
+
+
+def decode_runs(data, size):
+    """Grid bytes of a keyframe payload."""
+    parts = []
+    position = 0
+    while position < len(data):
+        cell = data[position]
+        run, position = read_varint(data, position + 1)
+        parts.append(bytes([cell]) * run)
+    cells = b"".join(parts)
+    if len(cells) != size:
+        raise ValueError("Corrupt keyframe in recording")
+    return cells
+
+
+def xor_bytes(first, second):
+    """Byte-wise XOR of two equally long byte strings."""
+    return (int.from_bytes(first, "little") ^ int.from_bytes(second, "little")
+            ).to_bytes(len(first), "little")
+
+
+def encode_delta(previous, cells):
+    """Changed cells as (varint gap, varint run length, new cells) runs."""
+    # Cells that differ are the nonzero bytes of the XOR of both grids
+    changed = xor_bytes(previous, cells)
+    out = bytearray()
+    last = 0
+    for run in CHANGES.finditer(changed):
+        start, end = run.span()
+        write_varint(out, start - last)
+        write_varint(out, end - start)
+        out += cells[start:end]
+        last = end
+    return out
+
+
+def apply_delta(life, data):
+    """Apply a delta payload to a life array in place."""
+    position = 0
+    index = 0
+    while position < len(data):
+        gap, position = read_varint(data, position)
+        run, position = read_varint(data, position)
+        index += gap
+        life[index:index + run] = array("b", data[position:position + run])
+        position += run
+        index += run
+
+
+class Recorder:
+    """Records a world generation by generation into a file on a background thread."""
+
+    def __init__(self, world, path, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.world = world
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, world.width, world.height, world.seed,
+                                    keyframe_interval, *(world.hut_pos or NO_POSITION),
+                                    *(world.castle_pos or NO_POSITION)))
+        terrain = encode_runs(bytes(world.terrain))
+        header = bytearray()
+        write_varint(header, len(terrain))
+        self.file.write(header + terrain)
+
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.error = None
+        self.thread = threading.Thread(target=self.write_records, daemon=True)
+        self.thread.start()
+        self.record()
+
+    def record(self):
+        """Record the current state of the world; call after every step."""
+        if self.error:
+            raise self.error
+        self.queue.put((self.world.generation, self.world.life.tobytes()))
+
+    def write_records(self):
+        """Writer thread: encode and write queued generations until close()."""
+        previous = None
+        previous_generation = keyframe_generation = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error:
+                # Keep taking generations so record() never blocks on a failed writer
+                continue
+            generation, cells = item
+            if previous is None or generation <= previous_generation or \
+                    generation - keyframe_generation >= self.keyframe_interval:
+                kind, payload = KEYFRAME, encode_runs(cells)
+                keyframe_generation = generation
+            else:
+                kind, payload = DELTA, encode_delta(previous, cells)
+            record = bytearray([kind])
+            write_varint(record, generation)
+            write_varint(record, len(payload))
+            try:
+                self.file.write(record + payload)
+            except OSError as error:
+                self.error = error
+            previous, previous_generation = cells, generation
+        self.file.close()
+
+    def close(self):
+        """Write the remaining generations and close the file."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error:
+            raise self.error
+
+
+class Player:
+    """Random access to the generations of a recording."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            # mmap cannot map an empty file
+            if not os.fstat(file.fileno()).st_size:
+                raise ValueError(f"{path} is not a recording")
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.data
+        if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+            data.close()
+            raise ValueError(f"{path} is not a recording")
+        (_, version, width, height, seed, self.keyframe_interval,
+         hut_x, hut_y, castle_x, castle_y) = HEADER.unpack_from(data)
+        if version != VERSION:
+            data.close()
+            raise ValueError(f"{path} has recording version {version}, expected {VERSION}")
+
+        self.world = World(width, height, seed)
+        self.world.place_buildings_at(stored_position(hut_x, hut_y),
+                                      stored_position(castle_x, castle_y))
+        length, position = read_varint(data, HEADER.size)
+        self.world.terrain[:] = decode_runs(data[position:position + length], width * height)
+        try:
+            self.index(position + length)
+        except ValueError:
+            data.close()
+            raise
+        # Record whose generation self.world holds
+        self.position = None
+
+    def index(self, position):
+        """Find every record; a generation that does not move forward overrides the ones after it."""
+        data = self.data
+        # Recorded generations, with the kind and payload bounds of their records
+        self.generations = []
+        self.records = []
+        while position < len(data):
+            try:
+                kind = data[position]
+                generation, start = read_varint(data, position + 1)
+                length, start = read_varint(data, start)
+            except IndexError:
+                # The recording was cut off while writing
+                break
+            if start + length > len(data):
+                break
+            cut = bisect.bisect_left(self.generations, generation)
+            del self.generations[cut:], self.records[cut:]
+            self.generations.append(generation)
+            self.records.append((kind, start, start + length))
+            position = start + length
+        if not self.generations:
+            raise ValueError("The recording holds no generations")
+
+    @property
+    def first(self):
+        """First recorded generation."""
+        return self.generations[0]
+
+    @property
+    def last(self):
+        """Last recorded generation."""
+        return self.generations[-1]
+
+    def seek(self, generation):
+        """Put the last recorded generation up to the given one into self.world and return it.
+
+        Decodes from the nearest keyframe before it, or carries on from the
+        generation seeked to last if that is closer, as when playing forward.
+        """
+        target = max(0, bisect.bisect_right(self.generations, generation) - 1)
+        keyframe = target
+        while self.records[keyframe][0] != KEYFRAME:
+            keyframe -= 1
+
+        world = self.world
+        if self.position is None or not keyframe <= self.position <= target:
+            _, start, end = self.records[keyframe]
+            world.life[:] = array("b", decode_runs(self.data[start:end], len(world.life)))
+            self.position = keyframe
+        for _, start, end in self.records[self.position + 1:target + 1]:
+            apply_delta(world.life, self.data[start:end])
+        self.position = target
+        world.generation = self.generations[target]
+        return world
+
+    def close(self):
+        """Unmap the file."""
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
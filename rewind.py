@@ -0,0 +1,96 @@
+"""Bounded in-memory history of the last generations of the game, for rewinding.
+
+Every change of the life grid (a generation, a fast-forward or an edit) is
+kept as the XOR of the grid before and after it, compressed with zlib. The
+XOR is zero wherever nothing changed, so it shrinks to a few bytes per run of
+changed cells, and applying the same mask again undoes the change: stepping
+back and forward through the history never steps the simulation. The oldest
+changes are dropped first once more than `generations` changes are kept or
+they take more than `memory` bytes.
+"""
+import zlib
+from array import array
+from collections import deque
+
+from recording import xor_bytes
+
+DEFAULT_GENERATIONS = 1000
+DEFAULT_MEMORY = 16 * 1024 * 1024
+# Bytes counted per change on top of its compressed mask, for the deque slot and tuple
+ENTRY_OVERHEAD = 100
+# zlib level of the masks; higher levels are slower and barely smaller on masks
+COMPRESSION_LEVEL = 1
+
+
+class History:
+    """Ring buffer of the recent changes of a world, to step back and forward through.
+
+    changes[:position] lead up to the world's current state, changes[position:]
+    were rewound and can be replayed until something new is recorded.
+    """
+
+    def __init__(self, world, generations=DEFAULT_GENERATIONS, memory=DEFAULT_MEMORY):
+        self.world = world
+        self.generations = generations
+        self.memory = memory
+        # (generation before, generation after, compressed XOR mask)
+        self.changes = deque()
+        self.position = 0
+        # Bytes taken by the changes
+        self.size = 0
+        # Life grid and generation at the current position
+        self.state = world.life.tobytes()
+        self.generation = world.generation
+
+    @property
+    def behind(self):
+        """Changes that can be stepped back."""
+        return self.position
+
+    @property
+    def ahead(self):
+        """Rewound changes that can be stepped forward again."""
+        return len(self.changes) - self.position
+
+    def record(self):
+        """Remember the change of the world since the last call, forgetting rewound ones."""
+        cells = self.world.life.tobytes()
+        if cells == self.state and self.world.generation == self.generation:
+            return
+        while len(self.changes) > self.position:
+            self.size -= len(self.changes.pop()[2]) + ENTRY_OVERHEAD
+
+        mask = zlib.compress(xor_bytes(self.state, cells), COMPRESSION_LEVEL)
+        self.changes.append((self.generation, self.world.generation, mask))
+        self.size += len(mask) + ENTRY_OVERHEAD
+        self.position += 1
+        self.state, self.generation = cells, self.world.generation
+
+        while self.changes and (len(self.changes) > self.generations or self.size > self.memory):
+            self.size -= len(self.changes.popleft()[2]) + ENTRY_OVERHEAD
+            self.position -= 1
+
+    def back(self):
+        """Undo the last change; False if there is nothing left to rewind."""
+        if not self.position:
+            return False
+        self.position -= 1
+        before, _, mask = self.changes[self.position]
+        self.apply(mask, before)
+        return True
+
+    def forward(self):
+        """Redo the next rewound change; False if there is none."""
+        if self.position == len(self.changes):
+            return False
+        _, after, mask = self.changes[self.position]
+        self.position += 1
+        self.apply(mask, after)
+        return True
+
+    def apply(self, mask, generation):
+        """Move the state by a change and copy it into the world."""
+        self.state = xor_bytes(self.state, zlib.decompress(mask))
+        self.generation = generation
+        self.world.life[:] = array("b", self.state)
+        self.world.generation = generation
@@ -0,0 +1,176 @@
+"""Zone rules of the Goblin vs Mage game of life, expressed as data.
+
+The rules are written as a declarative spec (a dict that can also be loaded
+from a JSON file) and compiled once into a dense lookup table indexed by
+(terrain code, cell state, goblin neighbors 0-8, mage neighbors 0-8), so an
+engine finds each cell's next state with a single lookup.
+"""
+import json
+
+# Life cell codes
+EMPTY = 0
+GOBLIN = 1
+MAGE = 2
+# Table result for a birth whose faction is picked at random (peaceful zones)
+SPAWN_RANDOM = 3
+
+CELL_CODES = {None: EMPTY, "goblin": GOBLIN, "mage": MAGE}
+CELL_NAMES = [None, "goblin", "mage"]
+
+# Terrain codes
+TERRAIN_NAMES = ["normal_grass", "red_grass",
+                 "cobble", "brown_grass", "flower_land"]
+TERRAIN_CODES = {name: code for code, name in enumerate(TERRAIN_NAMES)}
+
+# Rule table dimensions
+CELL_STATES = 3
+NEIGHBOR_STATES = 9
+RULE_TABLE_SIZE = len(TERRAIN_NAMES) * CELL_STATES * \
+    NEIGHBOR_STATES * NEIGHBOR_STATES
+
+# Rules for every zone.
+#   birth/survival: neighbor counts of the cell's own faction that spawn/keep it
+#   conflict: what happens when both factions spawn on the same cell,
+#       "majority" (more allies wins, equal leaves it empty) or "empty"
+#   ally_majority: a surviving cell with rivals nearby goes to the side with
+#       more neighbors, equal counts keep the occupant
+#   peaceful: no combat, birth/survival count all alive neighbors and births
+#       pick a random faction
+DEFAULT_ZONE_RULES = {
+    # --- Normal Zone ---
+    "normal_grass": {
+        "birth": {"goblin": [3], "mage": [3]},
+        "survival": {"goblin": [2, 3], "mage": [2, 3]},
+        "conflict": "majority"
+    },
+    # --- Goblin Base ---
+    "red_grass": {
+        "birth": {"goblin": [2], "mage": [3]},
+        "survival": {"goblin": [2, 3], "mage": [3, 4]},
+        "conflict": "majority"
+    },
+    # --- Mage Base ---
+    "cobble": {
+        "birth": {"goblin": [4], "mage": [3]},
+        "survival": {"goblin": [2, 3], "mage": [2, 3, 4, 5]},
+        "conflict": "majority"
+    },
+    # --- Deadly Zone ---
+    "brown_grass": {
+        "birth": {"goblin": [3], "mage": [3]},
+        "survival": {"goblin": [3], "mage": [3]},
+        "conflict": "majority",
+        "ally_majority": True
+    },
+    # --- Peaceful Zone ---
+    "flower_land": {
+        "peaceful": True,
+        "birth": [3],
+        "survival": [2, 3, 4]
+    }
+}
+
+
+def load_zone_rules(path):
+    """Load a zone rule spec from a JSON file, filling missing zones with the defaults."""
+    with open(path) as f:
+        zone_rules = json.load(f)
+
+    unknown = set(zone_rules) - set(TERRAIN_CODES)
+    if unknown:
+        raise ValueError(f"Unknown terrain in rules: {', '.join(sorted(unknown))}")
+    for terrain, rules in zone_rules.items():
+        check_zone_rules(terrain, rules)
+
+    return {**DEFAULT_ZONE_RULES, **zone_rules}
+
+
+def check_counts(where, counts):
+    """Raise ValueError unless counts is a list of neighbor counts from 0 to 8."""
+    if not isinstance(counts, list) or not all(
+            isinstance(count, int) and not isinstance(count, bool) and
+            0 <= count < NEIGHBOR_STATES for count in counts):
+        raise ValueError(f"{where} must be a list of neighbor counts from 0 to "
+                         f"{NEIGHBOR_STATES - 1}, got {counts!r}")
+
+
+def check_zone_rules(terrain, rules):
+    """Raise ValueError unless a zone's rules have the structure DEFAULT_ZONE_RULES documents."""
+    if not isinstance(rules, dict):
+        raise ValueError(f"Rules of {terrain} must be an object")
+    for key in ("birth", "survival"):
+        if key not in rules:
+            raise ValueError(f"Rules of {terrain} have no {key}")
+        if rules.get("peaceful"):
+            check_counts(f"{terrain} {key}", rules[key])
+            continue
+        if not isinstance(rules[key], dict) or set(rules[key]) != {"goblin", "mage"}:
+            raise ValueError(f"{terrain} {key} must give the counts of goblin and mage")
+        for faction, counts in rules[key].items():
+            check_counts(f"{terrain} {key} of {faction}", counts)
+    if rules.get("conflict", "majority") not in ("majority", "empty"):
+        raise ValueError(f"{terrain} conflict must be \"majority\" or \"empty\", "
+                         f"got {rules['conflict']!r}")
+
+
+def rule_index(terrain, cell, goblin_count, mage_count):
+    """Position of a (terrain, cell, goblin_count, mage_count) entry in the rule table."""
+    return ((terrain * CELL_STATES + cell) * NEIGHBOR_STATES + goblin_count) \
+        * NEIGHBOR_STATES + mage_count
+
+
+def contested_birth(rules, goblin_count, mage_count):
+    """Whether both factions meet their birth rule on an empty cell of a zone."""
+    if rules.get("peaceful"):
+        return False
+    return goblin_count in rules["birth"]["goblin"] and mage_count in rules["birth"]["mage"]
+
+
+def next_state(rules, cell, goblin_count, mage_count):
+    """Evaluate one zone's rules for a single cell."""
+    if rules.get("peaceful"):
+        alive_neighbors = goblin_count + mage_count
+        if cell == EMPTY:
+            return SPAWN_RANDOM if alive_neighbors in rules["birth"] else EMPTY
+        return cell if alive_neighbors in rules["survival"] else EMPTY
+
+    if cell == EMPTY:
+        goblin_born = goblin_count in rules["birth"]["goblin"]
+        mage_born = mage_count in rules["birth"]["mage"]
+        if goblin_born and mage_born:
+            if rules.get("conflict", "majority") == "majority":
+                if goblin_count > mage_count:
+                    return GOBLIN
+                if mage_count > goblin_count:
+                    return MAGE
+            return EMPTY
+        if goblin_born:
+            return GOBLIN
+        if mage_born:
+            return MAGE
+        return EMPTY
+
+    same_type_neighbors = goblin_count if cell == GOBLIN else mage_count
+    if same_type_neighbors not in rules["survival"][CELL_NAMES[cell]]:
+        return EMPTY
+
+    if rules.get("ally_majority") and goblin_count > 0 and mage_count > 0:
+        if goblin_count > mage_count:
+            return GOBLIN
+        if mage_count > goblin_count:
+            return MAGE
+    return cell
+
+
+def compile_rule_table(zone_rules=DEFAULT_ZONE_RULES):
+    """Compile a zone rule spec into a dense next-state lookup table."""
+    table = bytearray(RULE_TABLE_SIZE)
+    for terrain, code in TERRAIN_CODES.items():
+        # Terrain without its own rules uses the normal rules
+        rules = zone_rules.get(terrain, zone_rules["normal_grass"])
+        for cell in (EMPTY, GOBLIN, MAGE):
+            for goblin_count in range(NEIGHBOR_STATES):
+                for mage_count in range(NEIGHBOR_STATES):
+                    table[rule_index(code, cell, goblin_count, mage_count)] = \
+                        next_state(rules, cell, goblin_count, mage_count)
+    return bytes(table)
@@ -0,0 +1,149 @@
+"""Compact, versioned binary snapshots of a World.
+
+A snapshot file is a fixed little-endian header followed by the terrain
+and life planes:
+
+    magic       8 bytes  b"GVMSNAP\\0"
+    version     uint16
+    header      uint16   header size in bytes
+    width       uint32
+    height      uint32
+    seed        int64
+    generation  uint64
+    batches     uint32   add_random_entities() calls so far
+    hut         2 int32  (x, y), (-1, -1) without a hut
+    castle      2 int32  (x, y), (-1, -1) without a castle
+    terrain     uint64   file offset of the terrain plane
+    life        uint64   file offset of the life plane
+
+Terrain takes 3 bits per cell and life 2, stored as bit planes: bit k of
+every cell of a row is packed into ceil(width / 8) bytes, plane after plane,
+row after row. Buildings are stored as their positions (the blocked mask
+follows from them); the terrain clusters only matter while generating a world
+and are not stored.
+
+Snapshots are opened with mmap, so the header is read without touching the
+planes and rows are only paged in when they are unpacked: a Snapshot of a
+huge world opens instantly and reads just the rows asked for, load() unpacks
+it into a World.
+"""
+import mmap
+import struct
+
+import numpy as np
+
+from world import NO_POSITION, World, stored_position
+
+MAGIC = b"GVMSNAP\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIIqQI2i2iQQ")
+TERRAIN_BITS = 3
+LIFE_BITS = 2
+# Cells Snapshot.world() unpacks at a time
+UNPACK_CELLS = 1 << 20
+
+
+def row_bytes(width):
+    """Bytes of one row of one bit plane."""
+    return (width + 7) // 8
+
+
+def pack_planes(values, bits):
+    """Pack a (height, width) array of small codes into (bits, height, row bytes) bit planes."""
+    return np.stack([np.packbits(values >> bit & 1, axis=1, bitorder="little")
+                     for bit in range(bits)])
+
+
+def unpack_planes(planes, width):
+    """Codes of (bits, rows, row bytes) bit planes as a (rows, width) uint8 array."""
+    values = np.zeros(planes.shape[1:2] + (width,), dtype=np.uint8)
+    for bit, plane in enumerate(planes):
+        values |= np.unpackbits(plane, axis=1, count=width, bitorder="little") << bit
+    return values
+
+
+def save(world, path):
+    """Write a snapshot of a world."""
+    stride = row_bytes(world.width)
+    terrain_offset = HEADER.size
+    life_offset = terrain_offset + TERRAIN_BITS * world.height * stride
+    header = HEADER.pack(MAGIC, VERSION, HEADER.size, world.width, world.height, world.seed,
+                         world.generation, world.entity_batches,
+                         *(world.hut_pos or NO_POSITION), *(world.castle_pos or NO_POSITION),
+                         terrain_offset, life_offset)
+
+    shape = (world.height, world.width)
+    terrain = np.frombuffer(world.terrain, dtype=np.uint8).reshape(shape)
+    life = np.frombuffer(world.life, dtype=np.uint8).reshape(shape)
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(pack_planes(terrain, TERRAIN_BITS).tobytes())
+        file.write(pack_planes(life, LIFE_BITS).tobytes())
+
+
+class Snapshot:
+    """A snapshot file mapped into memory; rows are only read when unpacked."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map.size() < HEADER.size or self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a world snapshot")
+        (_, version, _, self.width, self.height, self.seed, self.generation,
+         self.entity_batches, hut_x, hut_y, castle_x, castle_y,
+         terrain_offset, life_offset) = HEADER.unpack_from(self.map)
+        if version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} has snapshot version {version}, expected {VERSION}")
+
+        self.hut_pos = stored_position(hut_x, hut_y)
+        self.castle_pos = stored_position(castle_x, castle_y)
+        stride = row_bytes(self.width)
+        self.terrain_planes = np.frombuffer(self.map, dtype=np.uint8, offset=terrain_offset,
+                                            count=TERRAIN_BITS * self.height * stride
+                                            ).reshape(TERRAIN_BITS, self.height, stride)
+        self.life_planes = np.frombuffer(self.map, dtype=np.uint8, offset=life_offset,
+                                         count=LIFE_BITS * self.height * stride
+                                         ).reshape(LIFE_BITS, self.height, stride)
+
+    def terrain_rows(self, first=0, last=None):
+        """Terrain codes of rows first to last (exclusive) as a uint8 array."""
+        return unpack_planes(self.terrain_planes[:, first:last], self.width)
+
+    def life_rows(self, first=0, last=None):
+        """Life codes of rows first to last (exclusive) as an int8 array."""
+        return unpack_planes(self.life_planes[:, first:last], self.width).view(np.int8)
+
+    def world(self):
+        """Unpack the whole snapshot into a new World, UNPACK_CELLS at a time."""
+        world = World(self.width, self.height, self.seed)
+        world.generation = self.generation
+        world.entity_batches = self.entity_batches
+        shape = (self.height, self.width)
+        terrain = np.frombuffer(world.terrain, dtype=np.uint8).reshape(shape)
+        life = np.frombuffer(world.life, dtype=np.int8).reshape(shape)
+        chunk = max(1, UNPACK_CELLS // self.width)
+        for first in range(0, self.height, chunk):
+            last = min(first + chunk, self.height)
+            terrain[first:last] = self.terrain_rows(first, last)
+            life[first:last] = self.life_rows(first, last)
+        world.place_buildings_at(self.hut_pos, self.castle_pos)
+        return world
+
+    def close(self):
+        """Unmap the file."""
+        del self.terrain_planes, self.life_planes
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path):
+    """Read a snapshot file into a new World."""
+    with Snapshot(path) as snapshot:
+        return snapshot.world()
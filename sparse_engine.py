@@ -0,0 +1,199 @@
+"""Sparse stepping engine for huge, mostly empty battlefields.
+
+Only live goblins and mages are stored, in a dict keyed by cell position.
+Neighbor counts are scattered from the live cells and terrain is sampled on
+demand, so memory and step time scale with the population instead of the map
+area. Maps larger than the world tile its terrain periodically; the world's
+own life grid then shows the top-left corner of the map, populate() seeds the
+rest of it and population() counts the whole map.
+"""
+from collections import defaultdict
+
+from counter_rng import spawn_faction
+from lookup_engine import NEIGHBOR_WEIGHTS, CELL_STRIDE, TERRAIN_STRIDE
+from rules import (EMPTY, GOBLIN, SPAWN_RANDOM,
+                   TERRAIN_NAMES, compile_rule_table, rule_index)
+from world import BASE_DENSITY, NEUTRAL_DENSITY, initial_cell
+
+try:
+    import numpy as np
+    from numpy_engine import initial_cells
+except ImportError:
+    # Without numpy populate() draws the map cell by cell
+    np = None
+
+# Map cells populate() draws from the counter RNG at once
+POPULATE_BLOCK = 1 << 18
+
+
+class SparseEngine:
+    """Steps a map of any size by tracking only its live cells."""
+
+    def __init__(self, world, rule_table=None, height=None, width=None):
+        self.table = rule_table or compile_rule_table()
+        for code in range(len(TERRAIN_NAMES)):
+            if self.table[rule_index(code, EMPTY, 0, 0)] != EMPTY:
+                raise ValueError(
+                    "Sparse engine needs rules where empty cells without neighbors stay empty")
+
+        # Terrain layer: the world's terrain, tiled over the whole battlefield
+        self.world = world
+        self.terrain_base = [[world.terrain[world.index(row, col)] * TERRAIN_STRIDE
+                              for col in range(world.width)]
+                             for row in range(world.height)]
+        self.height = height or world.height
+        self.width = width or world.width
+
+        # Keys are positions in a grid with a one-cell border, so neighbors
+        # falling off the map land on border keys instead of wrapping around
+        self.stride = self.width + 2
+        s = self.stride
+        self.offsets = (-s - 1, -s, -s + 1, -1, 1, s - 1, s, s + 1)
+        self.blocked = {self.key(row, col) for row in range(world.height)
+                        for col in range(world.width) if world.blocked[world.index(row, col)]}
+        self.live = {}
+        # Buffers reused by every advance(): the neighbor counts and the next
+        # generation, swapped with self.live
+        self.counts = defaultdict(int)
+        self.next_live = {}
+        self.sync()
+
+    def key(self, row, col):
+        """Dict key of a map cell."""
+        return (row + 1) * self.stride + col + 1
+
+    def position(self, key):
+        """(row, col) of a dict key."""
+        row, col = divmod(key, self.stride)
+        return row - 1, col - 1
+
+    def terrain_base_at(self, key):
+        """Rule table offset of the terrain under a cell, sampled from the terrain layer."""
+        row, col = self.position(key)
+        return self.terrain_base[row % self.world.height][col % self.world.width]
+
+    def in_world(self, key):
+        """Whether a map cell lies in the part of the map shown by the world."""
+        row, col = self.position(key)
+        return row < self.world.height and col < self.world.width
+
+    def sync(self):
+        """Pick up edits made directly to world.life."""
+        world = self.world
+        self.live = {key: cell for key, cell in self.live.items() if not self.in_world(key)}
+        for row in range(world.height):
+            for col in range(world.width):
+                cell = world.life[world.index(row, col)]
+                if cell != EMPTY:
+                    self.live[self.key(row, col)] = cell
+
+    def populate(self, base_density=BASE_DENSITY, neutral_density=NEUTRAL_DENSITY):
+        """Seed the map outside the world again the way initialize_life_grid() seeds the world.
+
+        Every cell is drawn from the counter RNG at its map position, so this
+        is the same for every run of a seed. With numpy the cells are drawn
+        POPULATE_BLOCK at a time and only the live ones are kept.
+        """
+        self.live = {key: cell for key, cell in self.live.items() if self.in_world(key)}
+        if np is None:
+            self.populate_cells(base_density, neutral_density)
+        else:
+            self.populate_blocks(base_density, neutral_density)
+
+    def populate_blocks(self, base_density, neutral_density):
+        """populate() in vectorized blocks of whole map rows."""
+        world = self.world
+        cols = np.arange(self.width)
+        # Terrain under every map column, for each row of the world
+        terrain = np.frombuffer(world.terrain, dtype=np.uint8).reshape(
+            world.height, world.width)[:, cols % world.width]
+        block_rows = max(1, POPULATE_BLOCK // self.width)
+        for first in range(0, self.height, block_rows):
+            rows = np.arange(first, min(first + block_rows, self.height))
+            cells = initial_cells(world.seed, world.generation, rows[:, None], cols,
+                                  terrain[rows % world.height], base_density, neutral_density)
+            if first < world.height:
+                # Columns inside the world are seeded by the world itself
+                cells[:world.height - first, :world.width] = EMPTY
+            live_rows, live_cols = np.nonzero(cells)
+            keys = (live_rows + first + 1) * self.stride + live_cols + 1
+            self.live.update(zip(keys.tolist(), cells[live_rows, live_cols].tolist()))
+
+    def populate_cells(self, base_density, neutral_density):
+        """populate() one cell at a time."""
+        world = self.world
+        seed = world.seed
+        generation = world.generation
+        for row in range(self.height):
+            terrain_row = self.terrain_base[row % world.height]
+            # Columns inside the world are seeded by the world itself
+            first = world.width if row < world.height else 0
+            for col in range(first, self.width):
+                terrain = terrain_row[col % world.width] // TERRAIN_STRIDE
+                cell = initial_cell(seed, generation, row, col, terrain,
+                                    base_density, neutral_density)
+                if cell != EMPTY:
+                    self.live[self.key(row, col)] = cell
+
+    def cell_changed(self, row, col):
+        """Pick up an edit to a single cell, e.g. after a mouse click."""
+        key = self.key(row, col)
+        cell = self.world.life[self.world.index(row, col)]
+        if cell == EMPTY:
+            self.live.pop(key, None)
+        else:
+            self.live[key] = cell
+
+    def population(self):
+        """Number of live goblins and mages."""
+        goblins = sum(1 for cell in self.live.values() if cell == GOBLIN)
+        return goblins, len(self.live) - goblins
+
+    def step(self, generations=1):
+        """Advance the map the given number of generations."""
+        for _ in range(generations):
+            self.advance()
+            self.world.generation += 1
+        self.write_world()
+
+    def advance(self):
+        """Compute the next generation of the live cells, without touching world.life."""
+        live = self.live
+        counts = self.counts
+        counts.clear()
+        for key, cell in live.items():
+            weight = NEIGHBOR_WEIGHTS[cell]
+            for offset in self.offsets:
+                counts[key + offset] += weight
+
+        # Live cells without any neighbors still need evaluating
+        for key in live:
+            if key not in counts:
+                counts[key] = 0
+
+        world = self.world
+        table = self.table
+        stride = self.stride
+        last_row = self.height
+        new_live = self.next_live
+        new_live.clear()
+        for key, packed in counts.items():
+            row, col = divmod(key, stride)
+            if not (1 <= row <= last_row and 1 <= col <= self.width) or key in self.blocked:
+                continue
+            new_cell = table[self.terrain_base_at(key) + live.get(key, EMPTY) * CELL_STRIDE + packed]
+            if new_cell == SPAWN_RANDOM:
+                new_cell = spawn_faction(world.seed, world.generation, row - 1, col - 1)
+            if new_cell != EMPTY:
+                new_live[key] = new_cell
+
+        self.live, self.next_live = new_live, live
+
+    def write_world(self):
+        """Show the top-left corner of the map in the world."""
+        world = self.world
+        world.clear_life()
+        for key, cell in self.live.items():
+            row, col = self.position(key)
+            if row < world.height and col < world.width:
+                world.life[world.index(row, col)] = cell
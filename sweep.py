@@ -0,0 +1,276 @@
+"""Parameter sweeps over headless battles, to find which zone favours whom.
+
+Every combination of grid size, starting densities (the base and neutral
+chances of initialize_life_grid) and terrain cluster sizes is run with a
+number of seeds on a pool of worker processes. Runs are submitted in chunks
+and every finished run is appended to a checkpoint file right away, so an
+interrupted sweep picks up where it stopped when started again with the same
+options. At the end the runs are aggregated into one table: for every
+parameter combination and zone, how often goblins or mages held the majority
+of the zone's live cells after the last generation.
+
+    python sweep.py --sizes 40 60 --base-densities 0.2 0.3 --runs 50 --generations 500
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import rules
+from engines import ENGINE_NAMES, create_engine, close_engine, advance_generation
+from world import BASE_DENSITY, CLUSTER_SIZES, NEUTRAL_DENSITY, check_cluster_sizes, create_world
+from zone_stats import zone_populations
+
+# Run parameters that, with the seed, engine and rules, identify a run; results are grouped by them
+PARAMETERS = ["size", "base_density", "neutral_density", "cluster_sizes", "generations"]
+
+# Columns of the results table
+TABLE_FIELDS = PARAMETERS + ["terrain", "runs", "goblin_wins", "mage_wins", "draws",
+                             "goblin_win_rate", "mage_win_rate",
+                             "mean_goblins", "mean_mages"]
+
+# Hex digits of the rule table digest identifying the rules of a run
+RULES_DIGEST_LENGTH = 16
+
+# Chunks kept queued per worker process
+CHUNKS_PER_WORKER = 2
+
+# Pseudo engine stepping each chunk's runs together with batch_engine.BatchEngine
+BATCH_ENGINE = "batch"
+
+
+def cluster_range(text):
+    """argparse type for cluster sizes written as MIN:MAX."""
+    smallest, largest = (int(value) for value in text.split(":"))
+    if not 0 < smallest <= largest:
+        raise argparse.ArgumentTypeError(f"invalid cluster sizes {text!r}, expected MIN:MAX")
+    return [smallest, largest]
+
+
+def run_key(task):
+    """Text identifying a run in the checkpoint file."""
+    return json.dumps(task, sort_keys=True)
+
+
+def task_world(task):
+    """The starting world of a run."""
+    return create_world(task["size"], task["size"], task["seed"], tuple(task["cluster_sizes"]),
+                        task["base_density"], task["neutral_density"])
+
+
+def battle_result(task, world, seconds):
+    """Checkpoint record of a finished run: its task, final zone populations and duration."""
+    zones = zone_populations(world)
+    return {"task": task,
+            "zones": {rules.TERRAIN_NAMES[code]: population for code, population in enumerate(zones)},
+            "seconds": seconds}
+
+
+def run_battle(task, engine_name, rule_table):
+    """Run one battle headless."""
+    start = time.perf_counter()
+    world = task_world(task)
+    engine = create_engine(engine_name, world, rule_table)
+    try:
+        advance_generation(world, engine, task["generations"])
+    finally:
+        close_engine(engine)
+    return battle_result(task, world, time.perf_counter() - start)
+
+
+def run_batch(tasks, rule_table):
+    """Run battles of the same size and length together on a BatchEngine."""
+    from batch_engine import BatchEngine
+
+    start = time.perf_counter()
+    worlds = [task_world(task) for task in tasks]
+    BatchEngine(worlds, rule_table).step(tasks[0]["generations"])
+    seconds = (time.perf_counter() - start) / len(tasks)
+    return [battle_result(task, world, seconds) for task, world in zip(tasks, worlds)]
+
+
+def run_chunk(tasks, engine_name, rule_table):
+    """Run a chunk of battles in a worker process."""
+    if engine_name != BATCH_ENGINE:
+        return [run_battle(task, engine_name, rule_table) for task in tasks]
+    groups = {}
+    for task in tasks:
+        groups.setdefault((task["size"], task["generations"]), []).append(task)
+    return [result for group in groups.values() for result in run_batch(group, rule_table)]
+
+
+def sweep_tasks(args, rule_table):
+    """Every run of the sweep, seeds varying fastest.
+
+    The engine and a digest of the rule table are part of every task, so a
+    checkpoint is only resumed by a sweep with the same settings.
+    """
+    rules_digest = hashlib.sha256(rule_table).hexdigest()[:RULES_DIGEST_LENGTH]
+    combinations = itertools.product(args.sizes, args.base_densities, args.neutral_densities,
+                                     args.cluster_sizes)
+    return [{"size": size, "base_density": base, "neutral_density": neutral,
+             "cluster_sizes": clusters, "generations": args.generations, "seed": seed,
+             "engine": args.engine, "rules": rules_digest}
+            for size, base, neutral, clusters in combinations
+            for seed in range(args.seed, args.seed + args.runs)]
+
+
+def load_checkpoint(path):
+    """Finished runs of an earlier, possibly interrupted, sweep, by run key."""
+    finished = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line of a killed sweep may be cut off
+                    continue
+                finished[run_key(result["task"])] = result
+    return finished
+
+
+def repair_checkpoint(path):
+    """Cut off a last line left unfinished by a killed sweep, so appending starts on a new line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+
+def run_sweep(tasks, finished, args, rule_table):
+    """Run the unfinished tasks on a process pool, appending each result to the checkpoint."""
+    pending = [task for task in tasks if run_key(task) not in finished]
+    chunks = [pending[start:start + args.chunk_size]
+              for start in range(0, len(pending), args.chunk_size)]
+    print(f"{len(tasks)} runs, {len(tasks) - len(pending)} already in {args.checkpoint}, "
+          f"{len(chunks)} chunks to go")
+    if not chunks:
+        return
+
+    chunks.reverse()
+    repair_checkpoint(args.checkpoint)
+    done = len(tasks) - len(pending)
+    start = time.perf_counter()
+    with open(args.checkpoint, "a") as checkpoint, \
+            ProcessPoolExecutor(args.workers) as executor:
+        running = set()
+        while chunks or running:
+            # Keep a bounded number of chunks queued instead of submitting them all
+            while chunks and len(running) < args.workers * CHUNKS_PER_WORKER:
+                running.add(executor.submit(run_chunk, chunks.pop(), args.engine, rule_table))
+            finished_now, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished_now:
+                for result in future.result():
+                    checkpoint.write(json.dumps(result) + "\n")
+                    finished[run_key(result["task"])] = result
+                    done += 1
+            checkpoint.flush()
+            elapsed = time.perf_counter() - start
+            print(f"\r{done}/{len(tasks)} runs, {elapsed:.0f}s", end="", flush=True)
+    print()
+
+
+def aggregate(results):
+    """Per-zone win counts of every parameter combination, as rows of the results table."""
+    groups = {}
+    for result in results:
+        task = result["task"]
+        parameters = tuple(json.dumps(task[name]) for name in PARAMETERS)
+        for terrain, (goblins, mages) in result["zones"].items():
+            group = groups.setdefault(parameters + (terrain,), [0, 0, 0, 0, 0, 0])
+            group[0] += 1
+            group[1] += goblins > mages
+            group[2] += mages > goblins
+            group[3] += goblins == mages
+            group[4] += goblins
+            group[5] += mages
+
+    rows = []
+    for key in sorted(groups):
+        runs, goblin_wins, mage_wins, draws, goblins, mages = groups[key]
+        row = dict(zip(PARAMETERS, (json.loads(value) for value in key[:-1])))
+        row.update(terrain=key[-1], runs=runs, goblin_wins=goblin_wins, mage_wins=mage_wins,
+                   draws=draws, goblin_win_rate=goblin_wins / runs,
+                   mage_win_rate=mage_wins / runs, mean_goblins=goblins / runs,
+                   mean_mages=mages / runs)
+        rows.append(row)
+    return rows
+
+
+def print_table(rows):
+    """Print the win rates of every parameter combination and zone."""
+    print(f"{'size':>5} {'base':>5} {'neutral':>7} {'clusters':>9} {'terrain':13} "
+          f"{'runs':>5} {'goblins':>8} {'mages':>8} {'draws':>6}")
+    for row in rows:
+        clusters = "{}:{}".format(*row["cluster_sizes"])
+        print(f"{row['size']:>5} {row['base_density']:>5} {row['neutral_density']:>7} "
+              f"{clusters:>9} {row['terrain']:13} {row['runs']:>5} "
+              f"{row['goblin_win_rate']:>8.1%} {row['mage_win_rate']:>8.1%} "
+              f"{row['draws'] / row['runs']:>6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40], help="Grid sides")
+    parser.add_argument("--base-densities", type=float, nargs="+", default=[BASE_DENSITY],
+                        help="Chances of a starting goblin on brown_grass or mage on flower_land")
+    parser.add_argument("--neutral-densities", type=float, nargs="+", default=[NEUTRAL_DENSITY],
+                        help="Chances of a starting goblin or mage on other terrain")
+    parser.add_argument("--cluster-sizes", type=cluster_range, nargs="+",
+                        default=[list(CLUSTER_SIZES)],
+                        help="Smallest and largest terrain clusters, as MIN:MAX")
+    parser.add_argument("--runs", type=int, default=20, help="Seeds per parameter combination")
+    parser.add_argument("--seed", type=int, default=0, help="First seed of every combination")
+    parser.add_argument("--generations", type=int, default=500, help="Generations per run")
+    # Runs already are spread over processes, the parallel engine cannot nest in them
+    parser.add_argument("--engine", default="lookup",
+                        choices=[name for name in ENGINE_NAMES if name != "parallel"] + [BATCH_ENGINE],
+                        help="Engine stepping every run; batch steps each chunk's runs together "
+                             "(use a larger --chunk-size)")
+    parser.add_argument("--rules", help="JSON file with zone rules for the table-driven engines")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=4, help="Runs per submitted task")
+    parser.add_argument("--checkpoint", default="sweep_checkpoint.jsonl",
+                        help="File finished runs are appended to and resumed from")
+    parser.add_argument("--output", default="sweep_results.csv",
+                        help="CSV file the aggregated results table is written to")
+    args = parser.parse_args()
+    for size, clusters in itertools.product(args.sizes, args.cluster_sizes):
+        # generate_clustered_terrain() would only give up after many tries
+        try:
+            check_cluster_sizes(size, size, clusters)
+        except ValueError as error:
+            parser.error("--sizes {} with --cluster-sizes {}:{}: {}".format(size, *clusters, error))
+    if args.rules and args.engine == "python":
+        # update_life_grid() hard-codes the default zone rules
+        parser.error("--rules needs a table-driven engine, not --engine python")
+
+    try:
+        zone_rules = rules.load_zone_rules(args.rules) if args.rules else rules.DEFAULT_ZONE_RULES
+    except ValueError as error:
+        parser.error(f"{args.rules}: {error}")
+    rule_table = rules.compile_rule_table(zone_rules)
+
+    tasks = sweep_tasks(args, rule_table)
+    finished = load_checkpoint(args.checkpoint)
+    run_sweep(tasks, finished, args, rule_table)
+
+    rows = aggregate(finished[run_key(task)] for task in tasks)
+    print_table(rows)
+    with open(args.output, "w", newline="") as file:
+        writer = csv.DictWriter(file, TABLE_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "cluster_sizes": "{}:{}".format(*row["cluster_sizes"])})
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
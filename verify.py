@@ -0,0 +1,321 @@
+"""Differential verification of the stepping engines against update_life_grid().
+
+The reference update_life_grid() is the oracle: every case is copied, stepped
+with the reference and with the candidate engine side by side, and compared
+after every generation. Cases are
+
+- rules: one world tiling every (terrain, cell, goblin count, mage count)
+  neighborhood, so each entry of the zone rules is exercised,
+- borders: tiny and thin grids with dense life along the edges,
+- buildings: buildings in corners, on edges and next to each other,
+  surrounded by dense life,
+- random: seeded random worlds of random sizes, terrain and densities.
+
+Every case is stepped one generation at a time, and again in jumps of up to
+--jump generations per step(n) call (hashlife advances those 2^k generations
+at once), compared after every jump. The cycle detector is checked too: the
+border and building cases and flower_land blinkers, whose births pick random
+factions, are stepped until cycles.CycleDetector reports a cycle, jumped ahead
+along it and compared with stepping there. The first diverging cell is
+reported with its neighborhood and the exit status is non-zero, so this can
+gate every engine change:
+
+    python verify.py --engines lookup numpy --worlds 50
+"""
+import argparse
+import random
+import sys
+
+from cycles import CycleDetector, describe
+from engines import ENGINE_NAMES, available_engines, create_engine, close_engine
+from rules import (EMPTY, GOBLIN, MAGE, TERRAIN_CODES, TERRAIN_NAMES, CELL_NAMES,
+                   NEIGHBOR_STATES)
+from world import BUILDING_SIZE, World, update_life_grid
+
+# Room for one rules case: a 3x3 neighborhood and an empty gap column and row
+CASE_PITCH = 4
+# Cases per row of the rules world
+CASES_PER_ROW = 32
+# Most generations advanced by one step(n) call in jump mode
+DEFAULT_JUMP = 8
+# Generations stepped while waiting for the cycle detector, and jumped along a cycle
+CYCLE_SEARCH = 100
+CYCLE_JUMP = 37
+
+LIFE_SYMBOLS = {EMPTY: ".", GOBLIN: "g", MAGE: "m"}
+
+
+def cell_name(cell):
+    """Readable name of a life cell code."""
+    return CELL_NAMES[cell] or "empty"
+
+
+class Case:
+    """A named starting world to step with the reference and an engine."""
+
+    def __init__(self, name, world, labels=None):
+        self.name = name
+        self.world = world
+        # Optional description of the cell at (row, col), e.g. its rules entry
+        self.labels = labels or {}
+        # Reference worlds after each generation, shared by all engines
+        self.history = [world]
+
+    def reference(self, generations):
+        """The reference worlds from the start up to the given generation."""
+        while len(self.history) <= generations:
+            world = self.history[-1].copy()
+            update_life_grid(world)
+            self.history.append(world)
+        return self.history[:generations + 1]
+
+
+def fill_random(world, rng, density):
+    """Random terrain in random rectangles and random life on open cells."""
+    world.terrain[:] = bytes([rng.randrange(len(TERRAIN_NAMES))]) * len(world.terrain)
+    for _ in range(rng.randint(0, 6)):
+        code = rng.randrange(len(TERRAIN_NAMES))
+        top, left = rng.randrange(world.height), rng.randrange(world.width)
+        for row in range(top, min(world.height, top + rng.randint(1, 12))):
+            for col in range(left, min(world.width, left + rng.randint(1, 12))):
+                world.terrain[world.index(row, col)] = code
+    for index in range(len(world.life)):
+        if not world.blocked[index] and rng.random() < density:
+            world.life[index] = rng.choice((GOBLIN, MAGE))
+
+
+def rules_case(seed):
+    """Every (terrain, cell, goblin count, mage count) neighborhood, side by side in one world."""
+    rng = random.Random(seed)
+    entries = [(terrain, cell, goblins, mages)
+               for terrain in range(len(TERRAIN_NAMES))
+               for cell in (EMPTY, GOBLIN, MAGE)
+               for goblins in range(NEIGHBOR_STATES)
+               for mages in range(NEIGHBOR_STATES - goblins)]
+    rows = -(-len(entries) // CASES_PER_ROW)
+    world = World(CASES_PER_ROW * CASE_PITCH, rows * CASE_PITCH, seed)
+    labels = {}
+    neighbors = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+    for number, (terrain, cell, goblins, mages) in enumerate(entries):
+        top, left = divmod(number, CASES_PER_ROW)
+        center = (top * CASE_PITCH + 1, left * CASE_PITCH + 1)
+        for row in range(center[0] - 1, center[0] + 2):
+            for col in range(center[1] - 1, center[1] + 2):
+                world.terrain[world.index(row, col)] = terrain
+
+        world.life[world.index(*center)] = cell
+        rng.shuffle(neighbors)
+        for position, (dy, dx) in enumerate(neighbors[:goblins + mages]):
+            world.life[world.index(center[0] + dy, center[1] + dx)] = \
+                GOBLIN if position < goblins else MAGE
+        labels[center] = (f"rules entry: {cell_name(cell)} on {TERRAIN_NAMES[terrain]} "
+                          f"with {goblins} goblin and {mages} mage neighbors")
+    return Case("rules", world, labels)
+
+
+def border_cases(seed):
+    """Tiny and thin grids, where most cells lie on an edge."""
+    rng = random.Random(seed)
+    cases = []
+    for width, height in ((1, 1), (1, 2), (2, 1), (2, 2), (1, 9), (9, 1), (3, 3), (2, 11), (11, 3)):
+        for density in (0.5, 0.9):
+            world = World(width, height, rng.getrandbits(32))
+            fill_random(world, rng, density)
+            cases.append(Case(f"border {width}x{height} density {density}", world))
+    return cases
+
+
+def building_cases(seed):
+    """Buildings in corners, on edges and touching each other, in dense life."""
+    rng = random.Random(seed)
+    size = 4 * BUILDING_SIZE
+    last = size - BUILDING_SIZE
+    layouts = [
+        ((0, 0), (last, last)),
+        ((last, 0), (0, last)),
+        ((0, 4), (BUILDING_SIZE, 4)),
+        ((4, 0), (4, BUILDING_SIZE)),
+        ((4, 4), (4 + BUILDING_SIZE, 4 + BUILDING_SIZE))
+    ]
+    cases = []
+    for hut_pos, castle_pos in layouts:
+        for density in (0.4, 0.8):
+            world = World(size, size, rng.getrandbits(32))
+            world.place_buildings_at(hut_pos, castle_pos)
+            fill_random(world, rng, density)
+            cases.append(Case(f"buildings at {hut_pos} and {castle_pos} density {density}", world))
+    return cases
+
+
+def random_cases(seed, count):
+    """Seeded random worlds of random sizes, terrain and densities."""
+    cases = []
+    for number in range(count):
+        world_seed = seed + number
+        rng = random.Random(world_seed)
+        world = World(rng.randint(4, 40), rng.randint(4, 40), world_seed)
+        fits = world.width > BUILDING_SIZE and world.height > BUILDING_SIZE
+        hut_pos, castle_pos = (
+            (rng.randrange(world.width - BUILDING_SIZE), rng.randrange(world.height - BUILDING_SIZE))
+            if rng.random() < 0.7 and fits else None for _ in range(2))
+        world.place_buildings_at(hut_pos, castle_pos)
+        fill_random(world, rng, rng.choice((0.05, 0.2, 0.35, 0.6)))
+        cases.append(Case(f"random world {world_seed} ({world.width}x{world.height})", world))
+    return cases
+
+
+def blinker_case(seed):
+    """A mage blinker whose lower and right arms lie on flower_land, the rest on normal_grass.
+
+    The births on flower_land pick random factions, so the blinker only repeats
+    itself by chance; a detector that misses those births jumps along a cycle
+    that is not one.
+    """
+    world = World(5, 5, seed)
+    world.terrain[:] = bytes([TERRAIN_CODES["normal_grass"]]) * len(world.terrain)
+    for row, col in ((2, 2), (2, 3), (3, 2)):
+        world.terrain[world.index(row, col)] = TERRAIN_CODES["flower_land"]
+    for row in (1, 2, 3):
+        world.life[world.index(row, 2)] = MAGE
+    return Case(f"flower_land blinker {seed}", world)
+
+
+def neighborhood(world, row, col):
+    """Life and terrain codes of the 3x3 neighborhood of a cell, one text line per row."""
+    lines = []
+    for y in range(row - 1, row + 2):
+        life, terrain = [], []
+        for x in range(col - 1, col + 2):
+            if 0 <= y < world.height and 0 <= x < world.width:
+                index = world.index(y, x)
+                life.append("#" if world.blocked[index] else LIFE_SYMBOLS[world.life[index]])
+                terrain.append(str(world.terrain[index]))
+            else:
+                life.append(" ")
+                terrain.append(" ")
+        lines.append(" ".join(life) + "    " + " ".join(terrain))
+    return lines
+
+
+def divergence(case, before, expected, actual):
+    """Description of the first cell where the engine and the reference disagree."""
+    steps = expected.generation - before.generation
+    for index, (want, got) in enumerate(zip(expected.life, actual.life)):
+        if want != got:
+            row, col = divmod(index, before.width)
+            lines = [
+                f"{case.name}: first divergence in generation {expected.generation} "
+                f"at row {row}, col {col} on {before.terrain_name(row, col)}",
+                f"  expected {cell_name(want)}, got {cell_name(got)}"
+            ]
+            if steps > 1:
+                lines[0] += f" after step({steps})"
+            if (row, col) in case.labels:
+                lines.append("  " + case.labels[(row, col)])
+            lines.append(f"  neighborhood generation {before.generation} "
+                         f"(life, # = building / terrain codes):")
+            lines += ["    " + line for line in neighborhood(before, row, col)]
+            return "\n".join(lines)
+    return None
+
+
+def verify_case(engine_name, case, generations, workers=None, jump=1):
+    """Step one case with an engine and compare it to the reference; the divergence report, or None.
+
+    The engine advances up to jump generations per step() call and is compared
+    after each call.
+    """
+    history = case.reference(generations)
+    actual = case.world.copy()
+    engine = create_engine(engine_name, actual, workers=workers)
+    try:
+        done = 0
+        while done < generations:
+            steps = min(jump, generations - done)
+            engine.step(steps)
+            before, expected = history[done], history[done + steps]
+            done += steps
+            if actual.life != expected.life or actual.generation != expected.generation:
+                return divergence(case, before, expected, actual) or \
+                    f"{case.name}: generation counter is {actual.generation}, " \
+                    f"expected {expected.generation}"
+    finally:
+        close_engine(engine)
+    return None
+
+
+def verify_cycle(case, search=CYCLE_SEARCH, ahead=CYCLE_JUMP):
+    """Jump a case along the first cycle detected and compare it to stepping; the report, or None."""
+    world = case.world.copy()
+    detector = CycleDetector(world)
+    cycle = None
+    while world.generation < search and cycle is None:
+        update_life_grid(world)
+        cycle = detector.observe()
+    if cycle is None:
+        return None
+
+    before = world.copy()
+    expected = world.copy()
+    for _ in range(ahead):
+        update_life_grid(expected)
+    detector.jump(None, world.generation + ahead)
+    if world.life == expected.life:
+        return None
+    return f"{case.name}: {describe(cycle)} detected in generation {before.generation}\n" + \
+        divergence(case, before, expected, world)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", nargs="+", choices=ENGINE_NAMES[1:],
+                        help="Engines to verify (default: all that are installed)")
+    parser.add_argument("--worlds", type=int, default=30, help="Number of random worlds")
+    parser.add_argument("--generations", type=int, default=12,
+                        help="Generations to step every case")
+    parser.add_argument("--jump", type=int, default=DEFAULT_JUMP,
+                        help="Generations per step(n) call when stepping in jumps (1: only "
+                             "single steps)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first random case")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Worker processes for the parallel engine")
+    args = parser.parse_args()
+    if args.jump < 1:
+        parser.error("--jump must be at least 1")
+
+    cases = [rules_case(args.seed)] + border_cases(args.seed) + \
+        building_cases(args.seed) + random_cases(args.seed, args.worlds)
+
+    jumps = sorted({1, args.jump})
+    failed = False
+    # Small worlds only: the detector steps them with the reference
+    cycle_cases = [blinker_case(args.seed + number) for number in range(args.worlds)] + \
+        border_cases(args.seed) + building_cases(args.seed)
+    for case in cycle_cases:
+        report = verify_cycle(case)
+        if report:
+            print("cycles: FAILED")
+            print(report)
+            failed = True
+            break
+    else:
+        print(f"cycles: ok ({len(cycle_cases)} cases, jumped {CYCLE_JUMP} generations "
+              f"along every cycle found)")
+    # Every installed engine but the reference itself
+    for engine_name in args.engines or available_engines()[1:]:
+        for jump, case in ((jump, case) for jump in jumps for case in cases):
+            report = verify_case(engine_name, case, args.generations, args.workers, jump)
+            if report:
+                mode = f" stepping {jump} at a time" if jump > 1 else ""
+                print(f"{engine_name}: FAILED{mode}")
+                print(report)
+                failed = True
+                break
+        else:
+            print(f"{engine_name}: ok ({len(cases)} cases, {args.generations} generations each, "
+                  f"stepped {' and '.join(map(str, jumps))} at a time)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,612 @@
+"""World state and the reference simulation of the Goblin vs Mage game of life.
+
+A World owns one battlefield: its terrain, buildings and life cells, stored
+as compact row-major arrays (cell (row, col) lives at index row * width + col)
+so several worlds can exist in one process and engines can view the same
+memory without copying. Every random decision is derived from the world's
+seed (see counter_rng), so a seed fully determines a world and its history.
+Nothing here depends on pygame.
+"""
+from array import array
+from collections import deque
+
+from counter_rng import (TERRAIN, BUILDINGS, INITIAL_LIFE, INITIAL_NEUTRAL_LIFE,
+                         INITIAL_FACTION, ENTITIES, new_seed, random_float,
+                         random_stream, spawn_faction)
+from rules import (EMPTY, GOBLIN, MAGE, TERRAIN_CODES, TERRAIN_NAMES)
+
+# Both buildings will be the same size - 3x3 tiles
+BUILDING_SIZE = 3
+
+# Smallest and largest number of tiles in one terrain cluster
+CLUSTER_SIZES = (50, 300)
+# Tiles of each terrain a generated map needs; the terrain is generated again until it has them
+MIN_TERRAIN_TILES = {
+    "cobble": 25,
+    "red_grass": 25,
+    "flower_land": 50,
+    "brown_grass": 50
+}
+# Terrain grown as a single cluster, the others get 2 to MAX_CLUSTERS clusters
+SINGLE_CLUSTER_TERRAIN = ("cobble", "red_grass")
+MAX_CLUSTERS = 4
+# Terrain maps generated before giving up on meeting MIN_TERRAIN_TILES
+TERRAIN_ATTEMPTS = 10000
+# Chance of a starting goblin on brown grass or mage on flower land
+BASE_DENSITY = 0.3
+# Chance of a starting goblin or mage anywhere else
+NEUTRAL_DENSITY = 0.05
+
+# Special zones
+GOBLIN_STRONGHOLD = TERRAIN_CODES["brown_grass"]  # Brown grass is goblin territory
+MAGE_BASE = TERRAIN_CODES["flower_land"]          # Flower land is mage territory
+
+NORMAL_GRASS = TERRAIN_CODES["normal_grass"]
+RED_GRASS = TERRAIN_CODES["red_grass"]
+COBBLE = TERRAIN_CODES["cobble"]
+BROWN_GRASS = TERRAIN_CODES["brown_grass"]
+FLOWER_LAND = TERRAIN_CODES["flower_land"]
+# Building position stored in files for a missing building
+NO_POSITION = (-1, -1)
+
+
+class World:
+    """Terrain, buildings and life cells of one battlefield."""
+
+    __slots__ = ("width", "height", "seed", "generation", "entity_batches",
+                 "terrain", "life", "blocked", "clusters", "hut_pos", "castle_pos")
+
+    def __init__(self, width, height, seed=0):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        # Generations stepped so far, part of the key of every random spawn
+        self.generation = 0
+        # Calls to add_random_entities(), so every batch lands elsewhere
+        self.entity_batches = 0
+        # Terrain codes (uint8), see rules.TERRAIN_NAMES
+        self.terrain = bytearray(width * height)
+        # Life cell codes (int8): EMPTY, GOBLIN or MAGE
+        self.life = array("b", bytes(width * height))
+        # 1 for every tile covered by a building
+        self.blocked = bytearray(width * height)
+        self.clusters = {}
+        self.hut_pos = None
+        self.castle_pos = None
+
+    def index(self, row, col):
+        """Position of a cell in the flat arrays."""
+        return row * self.width + col
+
+    def terrain_name(self, row, col):
+        """Name of the terrain at a cell."""
+        return TERRAIN_NAMES[self.terrain[row * self.width + col]]
+
+    def population(self):
+        """Number of live (goblins, mages)."""
+        return self.life.count(GOBLIN), self.life.count(MAGE)
+
+    def copy(self):
+        """Independent copy of the world, including its seed and generation."""
+        world = World(self.width, self.height, self.seed)
+        world.generation = self.generation
+        world.entity_batches = self.entity_batches
+        world.terrain[:] = self.terrain
+        world.life[:] = self.life
+        world.blocked[:] = self.blocked
+        world.clusters = {terrain: [set(cluster) for cluster in clusters]
+                          for terrain, clusters in self.clusters.items()}
+        world.hut_pos = self.hut_pos
+        world.castle_pos = self.castle_pos
+        return world
+
+    def clear_life(self):
+        """Remove all goblins and mages."""
+        self.life[:] = array("b", bytes(len(self.life)))
+
+    def place_buildings_at(self, hut_pos, castle_pos):
+        """Put the hut and castle at (x, y) positions (None: no building), blocking their tiles."""
+        # Only buildings block tiles, so unblocking the old ones clears the mask
+        for blocked, positions in ((0, (self.hut_pos, self.castle_pos)), (1, (hut_pos, castle_pos))):
+            for pos in positions:
+                if pos:
+                    for x, y in building_tiles(pos):
+                        self.blocked[self.index(y, x)] = blocked
+        self.hut_pos = hut_pos
+        self.castle_pos = castle_pos
+
+
+def create_world(width, height, seed=None, cluster_sizes=CLUSTER_SIZES,
+                 base_density=BASE_DENSITY, neutral_density=NEUTRAL_DENSITY):
+    """Generate terrain, place buildings and seed the life grid of a new world."""
+    world = World(width, height, new_seed() if seed is None else seed)
+    generate_clustered_terrain(world, cluster_sizes)
+    place_buildings(world)
+    initialize_life_grid(world, base_density, neutral_density)
+    return world
+
+
+def check_cluster_sizes(width, height, cluster_sizes):
+    """Raise ValueError if a width x height map with these cluster sizes can never meet MIN_TERRAIN_TILES."""
+    needed = sum(MIN_TERRAIN_TILES.values())
+    if min(width, height) <= 0 or width * height < needed:
+        raise ValueError(f"a {width}x{height} grid is too small for the terrain, "
+                         f"which needs {needed} tiles")
+    largest = cluster_sizes[1]
+    for terrain, tiles in MIN_TERRAIN_TILES.items():
+        clusters = 1 if terrain in SINGLE_CLUSTER_TERRAIN else MAX_CLUSTERS
+        if largest * clusters < tiles:
+            raise ValueError(f"clusters of at most {largest} tiles cannot give "
+                             f"{terrain} its {tiles} tiles")
+
+
+def generate_clustered_terrain(world, cluster_sizes=CLUSTER_SIZES):
+    """Generates a clustered terrain map with multiple clusters per terrain type.
+
+    cluster_sizes is the (smallest, largest) number of tiles a cluster grows to.
+    Raises ValueError if the map cannot or, after TERRAIN_ATTEMPTS tries, does
+    not give every terrain its MIN_TERRAIN_TILES.
+    """
+    check_cluster_sizes(world.width, world.height, cluster_sizes)
+    GRID_WIDTH = world.width
+    GRID_HEIGHT = world.height
+    rng = random_stream(world.seed, 0, 0, 0, TERRAIN)
+
+    def is_cluster_large_enough(grid):
+        """Check if all clusters meet the minimum size requirement."""
+        terrain_counts = {terrain: 0 for terrain in MIN_TERRAIN_TILES.keys()}
+
+        # Count terrain occurrences
+        for y in range(GRID_HEIGHT):
+            for x in range(GRID_WIDTH):
+                if grid[y][x] in terrain_counts:
+                    terrain_counts[grid[y][x]] += 1
+
+        # Check if all terrain types meet the required minimum size
+        for terrain, min_size in MIN_TERRAIN_TILES.items():
+            if terrain_counts[terrain] < min_size:
+                return False
+        return True
+
+    def generate():
+        """Generates the terrain and clusters."""
+        grid = [["normal_grass" for _ in range(
+            GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        cluster_map = {}
+
+        # Define terrain generation order
+        terrain_order = [
+            ["cobble", "red_grass"],
+            ["brown_grass", "flower_land"]
+        ]
+
+        for tier in terrain_order:
+            for terrain in tier:
+                cluster_map[terrain] = []
+                num_clusters = 1 if terrain in SINGLE_CLUSTER_TERRAIN \
+                    else rng.randint(2, MAX_CLUSTERS)
+                largest_cluster = None
+
+                for _ in range(num_clusters):
+                    start_x = rng.randint(0, GRID_WIDTH - 1)
+                    start_y = rng.randint(0, GRID_HEIGHT - 1)
+
+                    cluster_size = rng.randint(*cluster_sizes)
+                    stack = [(start_x, start_y)]
+                    count = 0
+                    cluster_positions = set()
+
+                    while stack and count < cluster_size:
+                        x, y = stack.pop()
+                        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT and grid[y][x] == "normal_grass":
+                            grid[y][x] = terrain
+                            cluster_positions.add((x, y))
+                            count += 1
+
+                            # Ensure connectivity
+                            neighbors = [(x + 1, y), (x - 1, y),
+                                         (x, y + 1), (x, y - 1)]
+                            if count % 5 == 0:
+                                neighbors += [(x + 1, y + 1), (x - 1, y - 1),
+                                              (x + 1, y - 1), (x - 1, y + 1)]
+
+                            rng.shuffle(neighbors)
+                            stack.extend(
+                                n for n in neighbors if 0 <= n[0] < GRID_WIDTH and 0 <= n[1] < GRID_HEIGHT)
+
+                    if len(cluster_positions) > 25:
+                        if terrain in SINGLE_CLUSTER_TERRAIN:
+                            if largest_cluster is None or len(cluster_positions) > len(largest_cluster):
+                                largest_cluster = cluster_positions
+                        else:
+                            cluster_map[terrain].append(cluster_positions)
+
+                if largest_cluster:
+                    cluster_map[terrain] = [largest_cluster]
+
+        return grid, cluster_map
+
+    # Loop until the terrain satisfies the cluster size requirements
+    for _ in range(TERRAIN_ATTEMPTS):
+        grid, cluster_map = generate()
+        if is_cluster_large_enough(grid):
+            break
+    else:
+        raise ValueError(f"no terrain of a {GRID_WIDTH}x{GRID_HEIGHT} grid with clusters of "
+                         "{}-{} tiles met the minimum tiles in {} tries".format(
+                             *cluster_sizes, TERRAIN_ATTEMPTS))
+
+    # Post-processing: Remove isolated 1x1 or 2x2 spots for any terrain type
+    for y in range(1, GRID_HEIGHT - 1):
+        for x in range(1, GRID_WIDTH - 1):
+            current_terrain = grid[y][x]
+            terrain_counts = {}
+
+            # Count surrounding terrain types
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1), (-1, 1), (1, -1)]:
+                neighbor = grid[y + dy][x + dx]
+                terrain_counts[neighbor] = terrain_counts.get(neighbor, 0) + 1
+
+            # If a terrain has 2 or fewer matching neighbors, convert it to the dominant surrounding terrain
+            if terrain_counts.get(current_terrain, 0) <= 1:
+                dominant_terrain = max(terrain_counts, key=terrain_counts.get)
+                if terrain_counts[dominant_terrain] >= 6:
+                    grid[y][x] = dominant_terrain
+
+    # Post-processing: Fill in fully enclosed normal_grass patches
+    def is_enclosed(x, y, grid, target_type):
+        """Checks if a `normal_grass` patch is completely enclosed by a single terrain type."""
+        queue = deque([(x, y)])
+        visited = set()
+        enclosed = True
+        dominant_terrain = None
+
+        while queue:
+            cx, cy = queue.popleft()
+            if (cx, cy) in visited:
+                continue
+            visited.add((cx, cy))
+
+            # Check bounds
+            if cx == 0 or cy == 0 or cx == GRID_WIDTH - 1 or cy == GRID_HEIGHT - 1:
+                enclosed = False  # Touching the edge means it's not enclosed
+
+            # Scan neighbors
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                nx, ny = cx + dx, cy + dy
+                if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT:
+                    neighbor = grid[ny][nx]
+                    if neighbor == target_type:
+                        queue.append((nx, ny))
+                    elif dominant_terrain is None:
+                        dominant_terrain = neighbor  # First surrounding terrain
+                    elif dominant_terrain != neighbor:
+                        enclosed = False  # Different terrain types mean it's not fully enclosed
+
+        return enclosed, dominant_terrain
+
+    for y in range(GRID_HEIGHT):
+        for x in range(GRID_WIDTH):
+            if grid[y][x] == "normal_grass":
+                enclosed, dominant_terrain = is_enclosed(
+                    x, y, grid, "normal_grass")
+                if enclosed and dominant_terrain:
+                    # Convert fully enclosed patch
+                    grid[y][x] = dominant_terrain
+
+    world.terrain[:] = bytes(TERRAIN_CODES[terrain]
+                             for row in grid for terrain in row)
+    world.clusters = cluster_map
+
+
+def check_building_fit(world, x, y, terrain_type):
+    """Check if a building can fit at the given position on the specified terrain."""
+    if (x + BUILDING_SIZE > world.width or
+            y + BUILDING_SIZE > world.height):
+        return False
+
+    # Check if all required tiles are of the right terrain
+    code = TERRAIN_CODES[terrain_type]
+    for dx in range(BUILDING_SIZE):
+        for dy in range(BUILDING_SIZE):
+            if world.terrain[world.index(y + dy, x + dx)] != code:
+                return False
+
+    return True
+
+
+def building_tiles(pos):
+    """All (x, y) tiles covered by a building at the given position."""
+    x, y = pos
+    return [(x + dx, y + dy) for dx in range(BUILDING_SIZE) for dy in range(BUILDING_SIZE)]
+
+
+def stored_position(x, y):
+    """Building position read from a file, None for NO_POSITION."""
+    return (x, y) if (x, y) != NO_POSITION else None
+
+
+def place_buildings(world):
+    """Places buildings on valid terrain (hut on red grass, castle on cobble)."""
+    clusters = world.clusters
+    rng = random_stream(world.seed, 0, 0, 0, BUILDINGS)
+    hut_pos = None
+    castle_pos = None
+
+    # Find a suitable location for the hut in red grass
+    if "red_grass" in clusters and clusters["red_grass"]:
+        # Sort clusters by size (largest first) to find good candidates
+        valid_red_clusters = sorted(
+            clusters["red_grass"], key=len, reverse=True)
+
+        for cluster in valid_red_clusters:
+            # Convert to list for random sampling
+            cluster_list = list(cluster)
+            # Try random positions until we find one that fits
+            rng.shuffle(cluster_list)
+
+            for x, y in cluster_list:
+                if check_building_fit(world, x, y, "red_grass"):
+                    hut_pos = (x, y)
+                    break
+
+            if hut_pos:
+                break
+
+    # Find a suitable location for the castle in cobble
+    if "cobble" in clusters and clusters["cobble"]:
+        valid_cobble_clusters = sorted(
+            clusters["cobble"], key=len, reverse=True)
+
+        for cluster in valid_cobble_clusters:
+            cluster_list = list(cluster)
+            rng.shuffle(cluster_list)
+
+            for x, y in cluster_list:
+                if check_building_fit(world, x, y, "cobble"):
+                    castle_pos = (x, y)
+                    break
+
+            if castle_pos:
+                break
+
+    world.place_buildings_at(hut_pos, castle_pos)
+
+
+def initial_cell(seed, generation, row, col, terrain, base_density=BASE_DENSITY,
+                 neutral_density=NEUTRAL_DENSITY):
+    """Starting occupant of an open cell, drawn from the counter RNG.
+
+    base_density is the chance of a goblin on brown grass or a mage on flower
+    land, neutral_density the chance of either anywhere else.
+    """
+    # Random initial population with higher odds near their respective zones
+    if terrain == GOBLIN_STRONGHOLD and \
+            random_float(seed, generation, row, col, INITIAL_LIFE) < base_density:
+        return GOBLIN
+    if terrain == MAGE_BASE and \
+            random_float(seed, generation, row, col, INITIAL_LIFE) < base_density:
+        return MAGE
+    # Sparser population in neutral territories
+    if random_float(seed, generation, row, col, INITIAL_NEUTRAL_LIFE) < neutral_density:
+        return GOBLIN if random_float(
+            seed, generation, row, col, INITIAL_FACTION) < 0.5 else MAGE
+    return EMPTY
+
+
+def initialize_life_grid(world, base_density=BASE_DENSITY, neutral_density=NEUTRAL_DENSITY):
+    """Initialize the game of life grid with some goblins and mages.
+
+    base_density is the chance of a goblin on brown grass or a mage on flower
+    land, neutral_density the chance of either anywhere else.
+    """
+    world.clear_life()
+    life = world.life
+    seed = world.seed
+    generation = world.generation
+
+    # Place some initial goblins and mages
+    for i in range(world.height):
+        for j in range(world.width):
+            index = i * world.width + j
+            # Skip building areas
+            if world.blocked[index]:
+                continue
+            life[index] = initial_cell(seed, generation, i, j, world.terrain[index],
+                                       base_density, neutral_density)
+
+
+def count_neighbors(world, row, col, cell_type):
+    """Count number of neighbors of specified type."""
+    life = world.life
+    width = world.width
+    count = 0
+    for i in range(max(0, row-1), min(world.height, row+2)):
+        for j in range(max(0, col-1), min(width, col+2)):
+            if (i != row or j != col) and life[i * width + j] == cell_type:
+                count += 1
+    return count
+
+
+def update_life_grid(world):
+    """Update the game of life grid according to the terrain-specific rules."""
+    life = world.life
+    width = world.width
+    new_grid = array("b", bytes(len(life)))
+    conflicts = []
+
+    for i in range(world.height):
+        for j in range(width):
+            index = i * width + j
+            # Skip building areas
+            if world.blocked[index]:
+                continue
+
+            terrain = world.terrain[index]
+            goblin_count = count_neighbors(world, i, j, GOBLIN)
+            mage_count = count_neighbors(world, i, j, MAGE)
+            cell = life[index]
+
+            # --- Normal Zone: normal_grass (green grass) ---
+            if terrain == NORMAL_GRASS:
+                if cell == EMPTY:
+                    # Reproduction: spawn only if exactly 3 neighbors of one type exist.
+                    if goblin_count == 3 and mage_count != 3:
+                        new_grid[index] = GOBLIN
+                    elif mage_count == 3 and goblin_count != 3:
+                        new_grid[index] = MAGE
+                    elif goblin_count == 3 and mage_count == 3:
+                        conflicts.append((index, goblin_count, mage_count))
+                else:
+                    if cell == GOBLIN:
+                        new_grid[index] = GOBLIN if goblin_count in (
+                            2, 3) else EMPTY
+                    elif cell == MAGE:
+                        new_grid[index] = MAGE if mage_count in (
+                            2, 3) else EMPTY
+
+            # --- Goblin Base: red_grass ---
+            elif terrain == RED_GRASS:
+                if cell == EMPTY:
+                    # Reproduction: goblins spawn with exactly 2 neighbors (strong reproduction),
+                    # mages spawn only if exactly 3 mage neighbors.
+                    if goblin_count == 2 and mage_count != 3:
+                        new_grid[index] = GOBLIN
+                    elif mage_count == 3 and goblin_count != 2:
+                        new_grid[index] = MAGE
+                    elif goblin_count == 2 and mage_count == 3:
+                        conflicts.append((index, goblin_count, mage_count))
+                else:
+                    if cell == GOBLIN:
+                        # Goblins survive with 2 or 3 neighbors (as in normal zone).
+                        new_grid[index] = GOBLIN if goblin_count in (
+                            2, 3) else EMPTY
+                    elif cell == MAGE:
+                        # Mages survive only with exactly 3 or 4 mage neighbors.
+                        new_grid[index] = MAGE if mage_count in (
+                            3, 4) else EMPTY
+
+            # --- Mage Base: cobble ---
+            elif terrain == COBBLE:
+                if cell == EMPTY:
+                    # Reproduction: goblins spawn with exactly 4 neighbors,
+                    # mages spawn with exactly 3 neighbors.
+                    if goblin_count == 4 and mage_count != 3:
+                        new_grid[index] = GOBLIN
+                    elif mage_count == 3 and goblin_count != 4:
+                        new_grid[index] = MAGE
+                    elif goblin_count == 4 and mage_count == 3:
+                        conflicts.append((index, goblin_count, mage_count))
+                else:
+                    if cell == GOBLIN:
+                        # Goblins use normal survival (2 or 3 neighbors) on mage base.
+                        new_grid[index] = GOBLIN if goblin_count in (
+                            2, 3) else EMPTY
+                    elif cell == MAGE:
+                        # Magicians survive if they have between 2 and 5 mage neighbors.
+                        new_grid[index] = MAGE if 2 <= mage_count <= 5 else EMPTY
+
+            # --- Deadly Zone: brown_grass ---
+            elif terrain == BROWN_GRASS:
+                if cell == EMPTY:
+                    # If both goblins and mages try to expand to the same empty cell, do not populate it.
+                    if goblin_count == 3 and mage_count == 3:
+                        conflicts.append((index, goblin_count, mage_count))
+                    # Normal reproduction: Spawn if exactly 3 neighbors of one type exist.
+                    elif goblin_count == 3 and mage_count != 3:
+                        new_grid[index] = GOBLIN
+                    elif mage_count == 3 and goblin_count != 3:
+                        new_grid[index] = MAGE
+
+                else:
+                    # Only consider same-type neighbors for survival
+                    same_type_neighbors = goblin_count if cell == GOBLIN else mage_count
+
+                    # Overcrowding: Dies if it has 4 or more same-type neighbors
+                    if same_type_neighbors >= 4:
+                        new_grid[index] = EMPTY
+                    # Isolation: Dies if it has fewer than 3 same-type neighbors
+                    elif same_type_neighbors < 3:
+                        new_grid[index] = EMPTY
+                    else:
+                        # Conflict resolution if both goblins and mages are nearby
+                        if goblin_count > 0 and mage_count > 0:
+                            if goblin_count > mage_count:
+                                new_grid[index] = GOBLIN
+                            elif mage_count > goblin_count:
+                                new_grid[index] = MAGE
+                            else:
+                                # Keep the existing occupant if equal allies
+                                new_grid[index] = cell
+                        else:
+                            # Maintain the cell's current state if no rival conflict
+                            new_grid[index] = cell
+
+            # --- Peaceful Zone: flower_land ---
+            elif terrain == FLOWER_LAND:
+                # Count all alive cells regardless of type
+                alive_neighbors = goblin_count + mage_count
+
+                if cell == EMPTY:
+                    # Spawn a random mob if exactly 3 alive neighbors exist
+                    if alive_neighbors == 3:
+                        new_grid[index] = spawn_faction(
+                            world.seed, world.generation, i, j)
+                else:
+                    # Survival rules based on total alive neighbors
+                    if alive_neighbors < 2 or alive_neighbors > 4:
+                        # Dies due to isolation or overpopulation
+                        new_grid[index] = EMPTY
+                    else:
+                        new_grid[index] = cell  # Survives
+
+            # --- Default: Other terrain uses normal rules ---
+            else:
+                if cell == EMPTY:
+                    if goblin_count == 3 and mage_count != 3:
+                        new_grid[index] = GOBLIN
+                    elif mage_count == 3 and goblin_count != 3:
+                        new_grid[index] = MAGE
+                    elif goblin_count == 3 and mage_count == 3:
+                        conflicts.append((index, goblin_count, mage_count))
+                else:
+                    if cell == GOBLIN:
+                        new_grid[index] = GOBLIN if goblin_count in (
+                            2, 3) else EMPTY
+                    elif cell == MAGE:
+                        new_grid[index] = MAGE if mage_count in (
+                            2, 3) else EMPTY
+
+    # --- Conflict resolution ---
+    for index, g_count, m_count in conflicts:
+        if g_count > m_count:
+            new_grid[index] = GOBLIN
+        elif m_count > g_count:
+            new_grid[index] = MAGE
+        else:
+            new_grid[index] = EMPTY
+
+    # Update in place so engines viewing world.life stay valid
+    life[:] = new_grid
+    world.generation += 1
+
+
+def add_random_entities(world, entity_type, count=50):
+    """Add random entities of given type to the life grid."""
+    rng = random_stream(world.seed, world.generation, world.entity_batches, entity_type, ENTITIES)
+    world.entity_batches += 1
+    added = 0
+
+    while added < count:
+        x = rng.randint(0, world.width - 1)
+        y = rng.randint(0, world.height - 1)
+        index = world.index(y, x)
+
+        # Skip building areas
+        if world.blocked[index]:
+            continue
+
+        # Add entity if space is empty
+        if world.life[index] == EMPTY:
+            world.life[index] = entity_type
+            added += 1
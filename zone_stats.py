@@ -0,0 +1,114 @@
+"""Per-zone population statistics, collected as a byproduct of stepping.
+
+An engine that supports statistics hands over one histogram per generation
+(its non-empty bins, at least), counting the open cells by transition: the rule table entry a cell was looked
+up with (terrain, cell, goblin and mage neighbors) and the state it ended up
+in. Everything per zone follows from that histogram, without rescanning the
+grid: live goblins and mages, births, deaths, survivals, cells taken over by
+the other faction and how contested births (both factions meeting their birth
+rule) were resolved. A row per zone and generation is streamed to a CSV or
+JSON lines file through a large write buffer:
+
+    python main.py --headless --engine numpy --generations 100000 --stats zones.csv
+"""
+import csv
+import json
+
+from rules import (EMPTY, GOBLIN, MAGE, CELL_STATES, NEIGHBOR_STATES, TERRAIN_NAMES,
+                   RULE_TABLE_SIZE, DEFAULT_ZONE_RULES, contested_birth)
+
+# Histogram bins: rule table index * CELL_STATES + next state
+TRANSITIONS = RULE_TABLE_SIZE * CELL_STATES
+
+# Columns of a zone row after seed, generation and terrain
+FIELDS = [
+    "goblins", "mages",
+    "goblin_births", "mage_births",
+    "goblin_deaths", "mage_deaths",
+    "goblin_survivals", "mage_survivals",
+    "goblins_converted", "mages_converted",
+    "conflicts_won_by_goblins", "conflicts_won_by_mages", "conflicts_left_empty"
+]
+FIELD_INDEX = {name: position for position, name in enumerate(FIELDS)}
+FACTION_PREFIX = {GOBLIN: "goblin", MAGE: "mage"}
+CONFLICT_FIELDS = {GOBLIN: "conflicts_won_by_goblins", MAGE: "conflicts_won_by_mages",
+                   EMPTY: "conflicts_left_empty"}
+
+# Bytes written to the stats file at once
+WRITE_BUFFER = 1 << 20
+
+
+def transition_fields(zone_rules, transition):
+    """Terrain code and the FIELDS positions a histogram bin adds to."""
+    entry, new_cell = divmod(transition, CELL_STATES)
+    entry, mage_count = divmod(entry, NEIGHBOR_STATES)
+    entry, goblin_count = divmod(entry, NEIGHBOR_STATES)
+    terrain, cell = divmod(entry, CELL_STATES)
+
+    fields = []
+    if new_cell != EMPTY:
+        fields.append(FACTION_PREFIX[new_cell] + "s")
+    if cell == EMPTY:
+        if new_cell != EMPTY:
+            fields.append(FACTION_PREFIX[new_cell] + "_births")
+        rules = zone_rules.get(TERRAIN_NAMES[terrain], zone_rules["normal_grass"])
+        if contested_birth(rules, goblin_count, mage_count):
+            fields.append(CONFLICT_FIELDS[new_cell])
+    elif new_cell == EMPTY:
+        fields.append(FACTION_PREFIX[cell] + "_deaths")
+    elif new_cell == cell:
+        fields.append(FACTION_PREFIX[cell] + "_survivals")
+    else:
+        fields.append(FACTION_PREFIX[cell] + "s_converted")
+    return terrain, [FIELD_INDEX[name] for name in fields]
+
+
+def zone_populations(world):
+    """Live [goblins, mages] on each terrain of a world, by terrain code."""
+    populations = [[0, 0] for _ in TERRAIN_NAMES]
+    for terrain, cell in zip(world.terrain, world.life):
+        if cell != EMPTY:
+            populations[terrain][cell != GOBLIN] += 1
+    return populations
+
+
+class ZoneStats:
+    """Turns per-generation transition histograms into zone rows and streams them to a file.
+
+    The format follows the file name: JSON lines for .jsonl and .json, CSV
+    otherwise.
+    """
+
+    def __init__(self, path, zone_rules=DEFAULT_ZONE_RULES):
+        self.file = open(path, "w", newline="", buffering=WRITE_BUFFER)
+        self.json = path.endswith((".jsonl", ".json"))
+        self.columns = [transition_fields(zone_rules, transition)
+                        for transition in range(TRANSITIONS)]
+        if not self.json:
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(["seed", "generation", "terrain"] + FIELDS)
+
+    def add(self, seed, generation, transitions, counts):
+        """Write the zone rows of the generation the histogram bins transitions with counts led to.
+
+        Empty bins may be left out.
+        """
+        rows = [[0] * len(FIELDS) for _ in TERRAIN_NAMES]
+        columns = self.columns
+        for transition, count in zip(transitions, counts):
+            terrain, fields = columns[transition]
+            row = rows[terrain]
+            for field in fields:
+                row[field] += count
+
+        for terrain, row in enumerate(rows):
+            if self.json:
+                self.file.write(json.dumps({"seed": seed, "generation": generation,
+                                            "terrain": TERRAIN_NAMES[terrain],
+                                            **dict(zip(FIELDS, row))}) + "\n")
+            else:
+                self.csv.writerow([seed, generation, TERRAIN_NAMES[terrain]] + row)
+
+    def close(self):
+        """Flush the buffered rows and close the file."""
+        self.file.close()